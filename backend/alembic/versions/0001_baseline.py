@@ -0,0 +1,176 @@
+"""baseline schema
+
+Brings any database to the schema the app had when migrations were introduced:
+creates missing tables and adds the columns and indexes that were previously
+added at startup. Tables that already exist are left as they are, so this is
+safe on fresh databases and on ones created by ``Base.metadata.create_all``.
+
+Revision ID: 0001
+Revises:
+Create Date: 2026-10-19 09:00:00
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+# revision identifiers, used by Alembic.
+revision: str = "0001"
+down_revision: Union[str, None] = None
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def _timestamp(name: str) -> sa.Column:
+    return sa.Column(name, sa.DateTime(timezone=True), server_default=sa.func.now())
+
+
+def upgrade() -> None:
+    existing = set(sa.inspect(op.get_bind()).get_table_names())
+
+    if "users" not in existing:
+        op.create_table(
+            "users",
+            sa.Column("id", postgresql.UUID(as_uuid=True), primary_key=True),
+            sa.Column("email", sa.String(255), nullable=False),
+            sa.Column("username", sa.String(100), nullable=False),
+            sa.Column("hashed_password", sa.String(255), nullable=False),
+            sa.Column("is_active", sa.Boolean()),
+            sa.Column("is_admin", sa.Boolean()),
+            _timestamp("created_at"),
+            _timestamp("updated_at"),
+        )
+        op.create_index("ix_users_email", "users", ["email"], unique=True)
+        op.create_index("ix_users_username", "users", ["username"], unique=True)
+
+    if "projects" not in existing:
+        op.create_table(
+            "projects",
+            sa.Column("id", postgresql.UUID(as_uuid=True), primary_key=True),
+            sa.Column("name", sa.String(255), nullable=False),
+            sa.Column("description", sa.Text()),
+            sa.Column("owner_id", postgresql.UUID(as_uuid=True), sa.ForeignKey("users.id"), nullable=False),
+            _timestamp("created_at"),
+            _timestamp("updated_at"),
+        )
+
+    if "project_classes" not in existing:
+        op.create_table(
+            "project_classes",
+            sa.Column("id", postgresql.UUID(as_uuid=True), primary_key=True),
+            sa.Column("project_id", postgresql.UUID(as_uuid=True),
+                      sa.ForeignKey("projects.id", ondelete="CASCADE"), nullable=False),
+            sa.Column("name", sa.String(100), nullable=False),
+            sa.Column("class_index", sa.Integer(), nullable=False),
+            sa.Column("color", sa.String(7), nullable=False),
+            _timestamp("created_at"),
+            sa.UniqueConstraint("project_id", "class_index", name="uq_project_class_index"),
+            sa.UniqueConstraint("project_id", "name", name="uq_project_class_name"),
+        )
+
+    if "project_members" not in existing:
+        op.create_table(
+            "project_members",
+            sa.Column("project_id", postgresql.UUID(as_uuid=True),
+                      sa.ForeignKey("projects.id", ondelete="CASCADE"), primary_key=True),
+            sa.Column("user_id", postgresql.UUID(as_uuid=True),
+                      sa.ForeignKey("users.id", ondelete="CASCADE"), primary_key=True),
+            sa.Column("role", sa.String(20), nullable=False),
+            _timestamp("joined_at"),
+        )
+
+    if "image_blobs" not in existing:
+        op.create_table(
+            "image_blobs",
+            sa.Column("content_hash", sa.String(64), primary_key=True),
+            sa.Column("storage_path", sa.String(500), nullable=False),
+            sa.Column("thumbnail_path", sa.String(500)),
+            sa.Column("width", sa.Integer(), nullable=False),
+            sa.Column("height", sa.Integer(), nullable=False),
+            sa.Column("file_size", sa.BigInteger(), nullable=False),
+            sa.Column("phash", sa.BigInteger()),
+            sa.Column("ref_count", sa.Integer(), nullable=False),
+            _timestamp("created_at"),
+        )
+
+    if "images" not in existing:
+        op.create_table(
+            "images",
+            sa.Column("id", postgresql.UUID(as_uuid=True), primary_key=True),
+            sa.Column("project_id", postgresql.UUID(as_uuid=True),
+                      sa.ForeignKey("projects.id", ondelete="CASCADE"), nullable=False),
+            sa.Column("filename", sa.String(255), nullable=False),
+            sa.Column("storage_path", sa.String(500), nullable=False),
+            sa.Column("thumbnail_path", sa.String(500)),
+            sa.Column("width", sa.Integer(), nullable=False),
+            sa.Column("height", sa.Integer(), nullable=False),
+            sa.Column("file_size", sa.BigInteger(), nullable=False),
+            sa.Column("content_hash", sa.String(64), sa.ForeignKey("image_blobs.content_hash")),
+            sa.Column("phash", sa.BigInteger()),
+            sa.Column("phash_cluster", postgresql.UUID(as_uuid=True)),
+            sa.Column("dataset_split", sa.String(10)),
+            _timestamp("uploaded_at"),
+            sa.UniqueConstraint("project_id", "content_hash", name="uq_image_project_content_hash"),
+        )
+
+    if "image_assignments" not in existing:
+        op.create_table(
+            "image_assignments",
+            sa.Column("image_id", postgresql.UUID(as_uuid=True),
+                      sa.ForeignKey("images.id", ondelete="CASCADE"), primary_key=True),
+            sa.Column("user_id", postgresql.UUID(as_uuid=True),
+                      sa.ForeignKey("users.id", ondelete="CASCADE"), nullable=False),
+            _timestamp("assigned_at"),
+            sa.UniqueConstraint("image_id", name="uq_image_assignment_image"),
+        )
+        op.create_index("ix_image_assignments_user_id", "image_assignments", ["user_id"])
+
+    if "annotations" not in existing:
+        op.create_table(
+            "annotations",
+            sa.Column("id", postgresql.UUID(as_uuid=True), primary_key=True),
+            sa.Column("image_id", postgresql.UUID(as_uuid=True),
+                      sa.ForeignKey("images.id", ondelete="CASCADE"), nullable=False),
+            sa.Column("class_id", postgresql.UUID(as_uuid=True),
+                      sa.ForeignKey("project_classes.id"), nullable=False),
+            sa.Column("vertices", postgresql.JSONB(), nullable=False),
+            sa.Column("created_by", postgresql.UUID(as_uuid=True), sa.ForeignKey("users.id"), nullable=False),
+            _timestamp("created_at"),
+            _timestamp("updated_at"),
+        )
+
+    if "file_deletions" not in existing:
+        op.create_table(
+            "file_deletions",
+            sa.Column("id", sa.BigInteger(), sa.Identity(), primary_key=True),
+            sa.Column("storage_key", sa.String(500), nullable=False),
+            _timestamp("enqueued_at"),
+        )
+
+    # Columns and indexes that older databases got from the startup DDL, if at all
+    op.execute("ALTER TABLE users ADD COLUMN IF NOT EXISTS is_admin BOOLEAN DEFAULT FALSE")
+    op.execute(
+        "ALTER TABLE images ADD COLUMN IF NOT EXISTS content_hash VARCHAR(64) "
+        "REFERENCES image_blobs(content_hash)"
+    )
+    op.execute(
+        "CREATE UNIQUE INDEX IF NOT EXISTS uq_image_project_content_hash ON images (project_id, content_hash)"
+    )
+    op.execute("CREATE INDEX IF NOT EXISTS ix_images_content_hash ON images (content_hash)")
+    op.execute("ALTER TABLE image_blobs ADD COLUMN IF NOT EXISTS phash BIGINT")
+    op.execute("ALTER TABLE images ADD COLUMN IF NOT EXISTS phash BIGINT")
+    op.execute("ALTER TABLE images ADD COLUMN IF NOT EXISTS phash_cluster UUID")
+    op.execute("CREATE INDEX IF NOT EXISTS ix_images_phash_cluster ON images (project_id, phash_cluster)")
+    for band in range(4):
+        op.execute(
+            f"CREATE INDEX IF NOT EXISTS ix_images_phash_band{band} "
+            f"ON images (project_id, ((phash >> {band * 16}) & 65535))"
+        )
+
+
+def downgrade() -> None:
+    for table in ("file_deletions", "annotations", "image_assignments", "images", "image_blobs",
+                  "project_members", "project_classes", "projects", "users"):
+        op.drop_table(table)
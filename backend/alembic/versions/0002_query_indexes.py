@@ -0,0 +1,51 @@
+"""indexes for the hot read paths
+
+- annotations(image_id): per-image annotation counts and loads, cascades from images
+- annotations(class_id): class deletes and per-class statistics
+- images(project_id, dataset_split): per-project counts and split-filtered exports
+- images(project_id, uploaded_at): the newest-first image listing without a sort
+
+images(project_id, dataset_split) also serves plain project_id lookups, so the
+single-column index added earlier is dropped. Indexes are built CONCURRENTLY so
+the upgrade does not block writes on large tables.
+
+Revision ID: 0002
+Revises: 0001
+Create Date: 2026-10-19 09:30:00
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = "0002"
+down_revision: Union[str, None] = "0001"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+INDEXES = {
+    "ix_annotations_image_id": "annotations (image_id)",
+    "ix_annotations_class_id": "annotations (class_id)",
+    "ix_images_project_split": "images (project_id, dataset_split)",
+    "ix_images_project_uploaded": "images (project_id, uploaded_at)",
+}
+
+
+def upgrade() -> None:
+    with op.get_context().autocommit_block():
+        for name, target in INDEXES.items():
+            # An interrupted concurrent build leaves an invalid index behind
+            op.execute(
+                f"DO $$ BEGIN IF EXISTS (SELECT 1 FROM pg_index i JOIN pg_class c ON c.oid = i.indexrelid "
+                f"WHERE c.relname = '{name}' AND NOT i.indisvalid) THEN DROP INDEX {name}; END IF; END $$"
+            )
+            op.execute(f"CREATE INDEX CONCURRENTLY IF NOT EXISTS {name} ON {target}")
+        op.execute("DROP INDEX CONCURRENTLY IF EXISTS ix_images_project_id")
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        op.execute("CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_images_project_id ON images (project_id)")
+        for name in INDEXES:
+            op.execute(f"DROP INDEX CONCURRENTLY IF EXISTS {name}")
@@ -0,0 +1,29 @@
+"""promote project owners to admin
+
+One-off data fix from when is_admin was introduced; it used to run on every startup.
+
+Revision ID: 0003
+Revises: 0002
+Create Date: 2026-10-19 10:00:00
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = "0003"
+down_revision: Union[str, None] = "0002"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.execute(
+        "UPDATE users SET is_admin = TRUE "
+        "WHERE is_admin IS NOT TRUE AND id IN (SELECT DISTINCT owner_id FROM projects)"
+    )
+
+
+def downgrade() -> None:
+    pass
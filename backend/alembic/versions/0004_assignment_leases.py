@@ -0,0 +1,29 @@
+"""work queue leases on image assignments
+
+Images claimed from the pull queue are assignments with a lease expiry;
+admin-made assignments keep NULL. Adding a nullable column without a default
+only touches the catalog, so this is instant on large tables.
+
+Revision ID: 0004
+Revises: 0003
+Create Date: 2026-10-19 11:00:00
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = "0004"
+down_revision: Union[str, None] = "0003"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # IF NOT EXISTS: databases built with create_all from the current models already have it
+    op.execute("ALTER TABLE image_assignments ADD COLUMN IF NOT EXISTS lease_expires_at TIMESTAMPTZ")
+
+
+def downgrade() -> None:
+    op.drop_column("image_assignments", "lease_expires_at")
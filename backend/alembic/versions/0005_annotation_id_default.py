@@ -0,0 +1,28 @@
+"""database-generated annotation ids
+
+Lets the bulk annotation import COPY rows without an id column instead of
+generating a uuid per annotation in Python. Changing a column default only
+touches the catalog.
+
+Revision ID: 0005
+Revises: 0004
+Create Date: 2026-10-19 14:00:00
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = "0005"
+down_revision: Union[str, None] = "0004"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.execute("ALTER TABLE annotations ALTER COLUMN id SET DEFAULT gen_random_uuid()")
+
+
+def downgrade() -> None:
+    op.execute("ALTER TABLE annotations ALTER COLUMN id DROP DEFAULT")
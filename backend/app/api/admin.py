@@ -4,10 +4,14 @@ from fastapi import APIRouter, Depends, HTTPException, status
 from sqlalchemy import select
 from sqlalchemy.ext.asyncio import AsyncSession
 
-from app.database import get_db
+from app.database import engine, get_db
 from app.models.user import User
 from app.schemas.user import UserCreate, UserUpdate, UserResponse
-from app.services.auth_service import hash_password
+from app.services.auth_service import PasswordHashingBusy, hash_password
+from app.services.cache_service import notify_change
+from app.services.storage_gc import reconcile_storage
+from app.monitoring.db import pool_status, route_stats
+from app.monitoring.profiler import profile_summaries, recent_profiles
 from app.api.deps import get_current_admin
 
 router = APIRouter(prefix="/api/admin", tags=["admin"])
@@ -34,11 +38,15 @@ async def create_user(
     if existing.scalar_one_or_none():
         raise HTTPException(status_code=400, detail="Email or username already registered")
 
-    user = User(
-        email=data.email,
-        username=data.username,
-        hashed_password=hash_password(data.password),
-    )
+    try:
+        hashed_password = await hash_password(data.password)
+    except PasswordHashingBusy:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Server busy, try again shortly",
+            headers={"Retry-After": "1"},
+        )
+    user = User(email=data.email, username=data.username, hashed_password=hashed_password)
     db.add(user)
     await db.flush()
     await db.refresh(user)
@@ -64,4 +72,35 @@ async def update_user(
 
     await db.flush()
     await db.refresh(user)
+    await notify_change(db, "user", str(user_id))
     return user
+
+
+@router.post("/storage/reconcile")
+async def reconcile_files(
+    dry_run: bool = True,
+    _admin: User = Depends(get_current_admin),
+):
+    """Find stored files no image refers to and queue them for deletion (report only when dry_run)."""
+    return await reconcile_storage(dry_run=dry_run)
+
+
+@router.get("/metrics/db")
+async def database_metrics(_admin: User = Depends(get_current_admin)):
+    """Connection pool state and per-route query counts for this worker process."""
+    return {"pool": pool_status(engine.sync_engine), "routes": route_stats()}
+
+
+@router.get("/metrics/profiles")
+async def list_sql_profiles(_admin: User = Depends(get_current_admin)):
+    """Recently profiled requests in this worker process, newest first."""
+    return profile_summaries()
+
+
+@router.get("/metrics/profiles/{profile_id}")
+async def get_sql_profile(profile_id: str, _admin: User = Depends(get_current_admin)):
+    """Every statement of a profiled request with its duration and call site."""
+    profile = recent_profiles.get(profile_id)
+    if profile is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Profile not found")
+    return profile
@@ -6,11 +6,12 @@ from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.database import get_db
 from app.models.user import User
-from app.models.project import Project, ProjectMember
-from app.models.image import Image, ImageAssignment
+from app.models.project import Project
+from app.models.image import Image
 from app.models.annotation import Annotation
 from app.schemas.annotation import AnnotationCreate, AnnotationUpdate, AnnotationResponse, BulkAnnotationSave
-from app.api.deps import get_current_user
+from app.services.cache_service import get_assignee, is_project_member
+from app.api.deps import get_current_user, get_read_db
 
 router = APIRouter(
     prefix="/api/projects/{project_id}/images/{image_id}/annotations",
@@ -25,32 +26,16 @@ async def _verify_image(project_id: uuid.UUID, image_id: uuid.UUID, user: User,
     if not project:
         raise HTTPException(status_code=404, detail="Project not found")
 
-    if not user.is_admin:
-        # Check membership
-        member = await db.execute(
-            select(ProjectMember).where(
-                ProjectMember.project_id == project_id,
-                ProjectMember.user_id == user.id,
-            )
-        )
-        if member.scalar_one_or_none() is None:
-            raise HTTPException(status_code=403, detail="Not a member of this project")
+    if not user.is_admin and not await is_project_member(db, project_id, user.id):
+        raise HTTPException(status_code=403, detail="Not a member of this project")
 
     img_result = await db.execute(select(Image).where(Image.id == image_id, Image.project_id == project_id))
     image = img_result.scalar_one_or_none()
     if not image:
         raise HTTPException(status_code=404, detail="Image not found")
 
-    if not user.is_admin:
-        # Check image is assigned to this user
-        assignment = await db.execute(
-            select(ImageAssignment).where(
-                ImageAssignment.image_id == image_id,
-                ImageAssignment.user_id == user.id,
-            )
-        )
-        if assignment.scalar_one_or_none() is None:
-            raise HTTPException(status_code=403, detail="Image not assigned to you")
+    if not user.is_admin and await get_assignee(db, image_id) != user.id:
+        raise HTTPException(status_code=403, detail="Image not assigned to you")
 
     return image
 
@@ -59,7 +44,7 @@ async def _verify_image(project_id: uuid.UUID, image_id: uuid.UUID, user: User,
 async def list_annotations(
     project_id: uuid.UUID,
     image_id: uuid.UUID,
-    db: AsyncSession = Depends(get_db),
+    db: AsyncSession = Depends(get_read_db),
     current_user: User = Depends(get_current_user),
 ):
     await _verify_image(project_id, image_id, current_user, db)
@@ -6,6 +6,7 @@ from app.database import get_db
 from app.models.user import User
 from app.schemas.user import UserLogin, UserResponse, TokenResponse, TokenRefresh
 from app.services.auth_service import (
+    PasswordHashingBusy,
     verify_password,
     create_access_token,
     create_refresh_token,
@@ -20,7 +21,15 @@ router = APIRouter(prefix="/api/auth", tags=["auth"])
 async def login(data: UserLogin, db: AsyncSession = Depends(get_db)):
     result = await db.execute(select(User).where(User.email == data.email))
     user = result.scalar_one_or_none()
-    if not user or not verify_password(data.password, user.hashed_password):
+    try:
+        valid = user is not None and await verify_password(data.password, user.hashed_password)
+    except PasswordHashingBusy:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Too many logins in progress, try again shortly",
+            headers={"Retry-After": "1"},
+        )
+    if not valid:
         raise HTTPException(status_code=401, detail="Invalid email or password")
 
     return TokenResponse(
@@ -3,17 +3,32 @@ from typing import Optional
 
 from fastapi import Depends, HTTPException, Query, status
 from fastapi.security import HTTPAuthorizationCredentials, HTTPBearer
-from sqlalchemy import select
 from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import make_transient_to_detached
 
-from app.database import get_db
+from app.database import get_db, read_session
 from app.models.user import User
-from app.models.project import ProjectMember
 from app.services.auth_service import decode_token
+from app.services.cache_service import get_user_row, is_project_member
 
 security = HTTPBearer()
 
 
+async def _active_user(db: AsyncSession, user_id: uuid.UUID) -> User:
+    # Looked up through a read session rather than db, so read-only endpoints authenticate
+    # without touching the primary; db is only tagged for read-your-writes routing
+    async with read_session(user_id) as session:
+        row = await get_user_row(session, user_id)
+    if row is None or not row["is_active"]:
+        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="User not found or inactive")
+
+    # A fresh detached instance per request, so cached rows are never shared between sessions
+    user = User(**row)
+    make_transient_to_detached(user)
+    db.info["user_id"] = user.id
+    return user
+
+
 async def get_current_user(
     credentials: HTTPAuthorizationCredentials = Depends(security),
     db: AsyncSession = Depends(get_db),
@@ -27,12 +42,7 @@ async def get_current_user(
     if user_id is None:
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid token payload")
 
-    result = await db.execute(select(User).where(User.id == uuid.UUID(user_id)))
-    user = result.scalar_one_or_none()
-    if user is None or not user.is_active:
-        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="User not found or inactive")
-
-    return user
+    return await _active_user(db, uuid.UUID(user_id))
 
 
 async def get_current_user_from_token_param(
@@ -51,12 +61,17 @@ async def get_current_user_from_token_param(
     if user_id is None:
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid token payload")
 
-    result = await db.execute(select(User).where(User.id == uuid.UUID(user_id)))
-    user = result.scalar_one_or_none()
-    if user is None or not user.is_active:
-        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="User not found or inactive")
+    return await _active_user(db, uuid.UUID(user_id))
 
-    return user
+
+async def get_read_db(current_user: User = Depends(get_current_user)):
+    """Session for read-only endpoints: a replica when configured, the primary right after the user wrote.
+
+    get_current_user's primary session is never used by these endpoints, so it
+    never checks out a connection.
+    """
+    async with read_session(current_user.id) as session:
+        yield session
 
 
 async def get_current_admin(
@@ -69,20 +84,14 @@ async def get_current_admin(
 
 async def get_project_member_or_admin(
     project_id: uuid.UUID,
-    db: AsyncSession = Depends(get_db),
+    db: AsyncSession = Depends(get_read_db),
     current_user: User = Depends(get_current_user),
 ) -> User:
     """Allow access if user is admin OR a member of the project."""
     if current_user.is_admin:
         return current_user
 
-    result = await db.execute(
-        select(ProjectMember).where(
-            ProjectMember.project_id == project_id,
-            ProjectMember.user_id == current_user.id,
-        )
-    )
-    if result.scalar_one_or_none() is None:
+    if not await is_project_member(db, project_id, current_user.id):
         raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Not a member of this project")
 
     return current_user
@@ -1,15 +1,17 @@
 import uuid
+from functools import partial
 
 from fastapi import APIRouter, Depends, HTTPException
 from fastapi.responses import StreamingResponse
 from sqlalchemy.ext.asyncio import AsyncSession
 
-from app.database import get_db
+from app.database import get_db, read_session
 from app.models.user import User
 from app.models.project import Project
-from app.schemas.export import DatasetSplitRequest
-from app.services.export_service import auto_split_dataset, generate_yolo_export
-from app.api.deps import get_current_admin
+from app.monitoring.metrics import EXPORT_DURATION, timed_export
+from app.schemas.export import DatasetSplitRequest, ExportRequest
+from app.services.export_service import auto_split_dataset, generate_yolo_export, generate_coco_export, generate_mask_export
+from app.api.deps import get_current_admin, get_read_db
 from sqlalchemy import select
 
 router = APIRouter(prefix="/api/projects/{project_id}/export", tags=["export"])
@@ -26,22 +28,44 @@ async def split_dataset(
     if not result.scalar_one_or_none():
         raise HTTPException(status_code=404, detail="Project not found")
 
-    await auto_split_dataset(db, project_id, data.train_ratio)
+    val_ratio = data.val_ratio if data.val_ratio is not None else 1.0 - data.train_ratio
+    if data.train_ratio < 0 or val_ratio < 0 or data.train_ratio + val_ratio > 1.0 + 1e-9:
+        raise HTTPException(status_code=400, detail="Split ratios must be non-negative and sum to at most 1")
+
+    await auto_split_dataset(db, project_id, data.train_ratio, val_ratio, data.seed, data.mode)
     return {"message": "Dataset split completed"}
 
 
 @router.post("/download")
 async def export_dataset(
     project_id: uuid.UUID,
-    db: AsyncSession = Depends(get_db),
-    _admin: User = Depends(get_current_admin),
+    data: ExportRequest | None = None,
+    db: AsyncSession = Depends(get_read_db),
+    admin: User = Depends(get_current_admin),
 ):
     result = await db.execute(select(Project).where(Project.id == project_id))
     project = result.scalar_one_or_none()
     if not project:
         raise HTTPException(status_code=404, detail="Project not found")
 
-    zip_buffer = await generate_yolo_export(db, project_id)
+    export_format = data.format if data else "yolo"
+
+    if export_format == "coco":
+        return StreamingResponse(
+            timed_export(generate_coco_export(project_id, partial(read_session, admin.id)), "coco"),
+            media_type="application/json",
+            headers={"Content-Disposition": f"attachment; filename={project.name}_coco.json"},
+        )
+
+    if export_format == "masks":
+        return StreamingResponse(
+            timed_export(generate_mask_export(project_id, partial(read_session, admin.id)), "masks"),
+            media_type="application/zip",
+            headers={"Content-Disposition": f"attachment; filename={project.name}_masks.zip"},
+        )
+
+    with EXPORT_DURATION.labels("yolo").time():
+        zip_buffer = await generate_yolo_export(db, project_id)
 
     return StreamingResponse(
         zip_buffer,
@@ -1,19 +1,35 @@
 import uuid
-from pathlib import Path
+from typing import Literal
 
-from fastapi import APIRouter, Depends, HTTPException, UploadFile, File, status
-from fastapi.responses import FileResponse
-from sqlalchemy import select, func, delete
+from fastapi import APIRouter, Depends, HTTPException, UploadFile, File, Query, Header, status
+from fastapi.responses import RedirectResponse, StreamingResponse
+from sqlalchemy import select, func, delete, exists
+from sqlalchemy.dialects.postgresql import insert
 from sqlalchemy.ext.asyncio import AsyncSession
 
+from app.config import settings
 from app.database import get_db
 from app.models.user import User
 from app.models.project import Project, ProjectMember
 from app.models.image import Image, ImageAssignment
 from app.models.annotation import Annotation
-from app.schemas.image import ImageResponse, ImageSplitUpdate, ImageAssignRequest, ImageAutoAssignRequest, AssignmentStatsItem
-from app.services.image_service import save_uploaded_image
-from app.api.deps import get_current_user, get_current_admin, get_current_user_from_token_param
+from app.schemas.image import (
+    ImageResponse, ImageBundleItem, ImageBundleResponse, ImageSplitUpdate, ImageAssignRequest, ImageAutoAssignRequest, AssignmentStatsItem,
+    NearDuplicateItem, ImageClusterItem, ThumbnailBatchRequest,
+)
+from app.schemas.annotation import AnnotationResponse
+from app.services.cache_service import get_assignee, is_project_member, notify_change
+from app.services.image_service import image_list_query, images_after, save_uploaded_image, release_image_files
+from app.services.storage import get_storage
+from app.services.storage_gc import enqueue_file_deletions
+from app.services.thumbnail_service import (
+    MEDIA_TYPES, get_thumbnail, iter_thumbnail_bundle, negotiate_format, pick_size,
+)
+from app.services.similarity_service import (
+    MAX_NEAR_DUPLICATE_RADIUS, assign_phash_cluster, find_near_duplicates, list_phash_clusters,
+)
+from app.utils.file_response import OffloadedFileResponse
+from app.api.deps import get_current_user, get_current_admin, get_current_user_from_token_param, get_read_db
 
 router = APIRouter(prefix="/api/projects/{project_id}/images", tags=["images"])
 
@@ -25,15 +41,8 @@ async def _verify_project_access(project_id: uuid.UUID, user: User, db: AsyncSes
     if not project:
         raise HTTPException(status_code=404, detail="Project not found")
 
-    if not user.is_admin:
-        member = await db.execute(
-            select(ProjectMember).where(
-                ProjectMember.project_id == project_id,
-                ProjectMember.user_id == user.id,
-            )
-        )
-        if member.scalar_one_or_none() is None:
-            raise HTTPException(status_code=403, detail="Not a member of this project")
+    if not user.is_admin and not await is_project_member(db, project_id, user.id):
+        raise HTTPException(status_code=403, detail="Not a member of this project")
 
     return project
 
@@ -54,12 +63,27 @@ async def _build_image_response(img: Image, db: AsyncSession) -> ImageResponse:
     return resp
 
 
+async def _serve_stored_file(key: str, filename: str | None, missing_detail: str):
+    """Redirect to the object store when it can serve the file itself, otherwise stream it from disk."""
+    storage = get_storage()
+    url = await storage.presigned_url(key, filename)
+    if url:
+        return RedirectResponse(url, status_code=status.HTTP_307_TEMPORARY_REDIRECT)
+
+    path = storage.local_path(key)
+    if not path.exists():
+        raise HTTPException(status_code=404, detail=missing_detail)
+
+    # Stored files never change, so prefetched copies can be reused by the annotator
+    return OffloadedFileResponse(path, media_type="image/jpeg", headers={"Cache-Control": "private, max-age=86400"})
+
+
 # ---- Fixed routes MUST come before /{image_id} routes ----
 
 @router.get("/unassigned", response_model=list[ImageResponse])
 async def list_unassigned(
     project_id: uuid.UUID,
-    db: AsyncSession = Depends(get_db),
+    db: AsyncSession = Depends(get_read_db),
     _admin: User = Depends(get_current_admin),
 ):
     """List images without assignments."""
@@ -79,7 +103,7 @@ async def list_unassigned(
 @router.get("/stats", response_model=list[AssignmentStatsItem])
 async def assignment_stats(
     project_id: uuid.UUID,
-    db: AsyncSession = Depends(get_db),
+    db: AsyncSession = Depends(get_read_db),
     _admin: User = Depends(get_current_admin),
 ):
     """Get assignment statistics per annotator."""
@@ -115,6 +139,56 @@ async def assignment_stats(
     return stats
 
 
+@router.get("/clusters", response_model=list[ImageClusterItem])
+async def list_clusters(
+    project_id: uuid.UUID,
+    min_size: int = Query(2, ge=1),
+    db: AsyncSession = Depends(get_read_db),
+    _admin: User = Depends(get_current_admin),
+):
+    """List groups of near-duplicate images (e.g. consecutive video frames)."""
+    clusters = await list_phash_clusters(db, project_id, min_size)
+    return [
+        ImageClusterItem(cluster_id=cluster_id, image_ids=image_ids, size=len(image_ids))
+        for cluster_id, image_ids in clusters
+    ]
+
+
+@router.post("/thumbnails")
+async def serve_thumbnail_bundle(
+    project_id: uuid.UUID,
+    data: ThumbnailBatchRequest,
+    accept: str | None = Header(None),
+    db: AsyncSession = Depends(get_read_db),
+    current_user: User = Depends(get_current_user),
+):
+    """Thumbnails for many images in one response, for grid views.
+
+    The body is a sequence of ``16-byte image id | uint32 big-endian length | image``
+    entries in no particular order; X-Thumbnail-Type gives the image format.
+    Images that don't exist or aren't visible to the user are omitted.
+    """
+    if data.image_ids is not None:
+        query = select(Image).where(Image.project_id == project_id, Image.id.in_(data.image_ids))
+    else:
+        assignee_id = None if current_user.is_admin else current_user.id
+        query = image_list_query(project_id, assignee_id).offset(data.skip).limit(data.limit)
+    # Access check and image lookup in a single query
+    if not current_user.is_admin:
+        query = query.where(
+            exists().where(ProjectMember.project_id == project_id, ProjectMember.user_id == current_user.id)
+        )
+    result = await db.execute(query)
+    images = result.scalars().all()
+
+    fmt = negotiate_format(accept)
+    return StreamingResponse(
+        iter_thumbnail_bundle(images, pick_size(data.size), fmt),
+        media_type="application/octet-stream",
+        headers={"X-Thumbnail-Type": MEDIA_TYPES[fmt], "Vary": "Accept"},
+    )
+
+
 @router.post("/assign", status_code=status.HTTP_200_OK)
 async def assign_images(
     project_id: uuid.UUID,
@@ -147,6 +221,7 @@ async def assign_images(
         assigned += 1
 
     await db.flush()
+    await notify_change(db, "assignment")
     return {"assigned": assigned}
 
 
@@ -191,6 +266,7 @@ async def auto_assign_images(
         assigned += 1
 
     await db.flush()
+    await notify_change(db, "assignment")
     return {"assigned": assigned}
 
 
@@ -201,30 +277,13 @@ async def list_images(
     project_id: uuid.UUID,
     skip: int = 0,
     limit: int = 1000,
-    db: AsyncSession = Depends(get_db),
+    db: AsyncSession = Depends(get_read_db),
     current_user: User = Depends(get_current_user),
 ):
     await _verify_project_access(project_id, current_user, db)
 
-    if current_user.is_admin:
-        query = (
-            select(Image)
-            .where(Image.project_id == project_id)
-            .order_by(Image.uploaded_at.desc())
-            .offset(skip)
-            .limit(limit)
-        )
-    else:
-        query = (
-            select(Image)
-            .join(ImageAssignment, ImageAssignment.image_id == Image.id)
-            .where(Image.project_id == project_id, ImageAssignment.user_id == current_user.id)
-            .order_by(Image.uploaded_at.desc())
-            .offset(skip)
-            .limit(limit)
-        )
-
-    result = await db.execute(query)
+    assignee_id = None if current_user.is_admin else current_user.id
+    result = await db.execute(image_list_query(project_id, assignee_id).offset(skip).limit(limit))
     images = result.scalars().all()
 
     response = []
@@ -238,6 +297,11 @@ async def list_images(
 async def upload_images(
     project_id: uuid.UUID,
     files: list[UploadFile] = File(...),
+    on_duplicate: Literal["skip", "link"] = Query(
+        "skip",
+        description="Files already in the project are never stored twice: "
+                    "'skip' leaves them out of the response, 'link' returns the existing image flagged as duplicate.",
+    ),
     db: AsyncSession = Depends(get_db),
     current_user: User = Depends(get_current_admin),
 ):
@@ -250,18 +314,33 @@ async def upload_images(
         if not file.content_type or not file.content_type.startswith("image/"):
             continue
 
-        info = await save_uploaded_image(file, project_id)
-        image = Image(
-            project_id=project_id,
-            filename=info["filename"],
-            storage_path=info["storage_path"],
-            thumbnail_path=info["thumbnail_path"],
-            width=info["width"],
-            height=info["height"],
-            file_size=info["file_size"],
-        )
-        db.add(image)
-        await db.flush()
+        info = await save_uploaded_image(db, file, project_id)
+        if "duplicate_of" not in info:
+            values = {"project_id": project_id, **info}
+            result = await db.execute(
+                insert(Image)
+                .values(**values)
+                .on_conflict_do_nothing(index_elements=[Image.project_id, Image.content_hash])
+                .returning(Image)
+            )
+            image = result.scalar_one_or_none()
+            if image is None:
+                # A concurrent upload of the same file got in first: give back the
+                # blob reference taken for this one, then report theirs
+                await enqueue_file_deletions(db, await release_image_files(db, Image(**values)))
+                existing = await db.execute(
+                    select(Image).where(Image.project_id == project_id, Image.content_hash == info["content_hash"])
+                )
+                info = {"duplicate_of": existing.scalar_one()}
+
+        if "duplicate_of" in info:
+            if on_duplicate == "link":
+                resp = ImageResponse.model_validate(info["duplicate_of"])
+                resp.duplicate = True
+                created_images.append(resp)
+            continue
+
+        await assign_phash_cluster(db, image)
         await db.refresh(image)
         created_images.append(ImageResponse.model_validate(image))
 
@@ -272,7 +351,7 @@ async def upload_images(
 async def get_image(
     project_id: uuid.UUID,
     image_id: uuid.UUID,
-    db: AsyncSession = Depends(get_db),
+    db: AsyncSession = Depends(get_read_db),
     current_user: User = Depends(get_current_user),
 ):
     await _verify_project_access(project_id, current_user, db)
@@ -283,6 +362,75 @@ async def get_image(
     return await _build_image_response(image, db)
 
 
+@router.get("/{image_id}/bundle", response_model=ImageBundleResponse)
+async def get_image_bundle(
+    project_id: uuid.UUID,
+    image_id: uuid.UUID,
+    ahead: int = Query(3, ge=0, le=20),
+    db: AsyncSession = Depends(get_read_db),
+    current_user: User = Depends(get_current_user),
+):
+    """Metadata and annotations of an image and the next `ahead` images in list order
+    (the caller's assigned images for annotators), in a fixed number of queries."""
+    await _verify_project_access(project_id, current_user, db)
+    result = await db.execute(select(Image).where(Image.id == image_id, Image.project_id == project_id))
+    image = result.scalar_one_or_none()
+    if not image:
+        raise HTTPException(status_code=404, detail="Image not found")
+    if not current_user.is_admin and await get_assignee(db, image_id) != current_user.id:
+        raise HTTPException(status_code=403, detail="Image not assigned to you")
+
+    images = [image]
+    if ahead:
+        assignee_id = None if current_user.is_admin else current_user.id
+        query = images_after(image_list_query(project_id, assignee_id), image.uploaded_at, image.id)
+        images += (await db.execute(query.limit(ahead))).scalars().all()
+    image_ids = [img.id for img in images]
+
+    annotations: dict[uuid.UUID, list[AnnotationResponse]] = {img_id: [] for img_id in image_ids}
+    result = await db.execute(
+        select(Annotation).where(Annotation.image_id.in_(image_ids)).order_by(Annotation.created_at)
+    )
+    for ann in result.scalars():
+        annotations[ann.image_id].append(AnnotationResponse.model_validate(ann))
+
+    result = await db.execute(
+        select(ImageAssignment.image_id, User.username)
+        .join(User, ImageAssignment.user_id == User.id)
+        .where(ImageAssignment.image_id.in_(image_ids))
+    )
+    assignees = dict(result.all())
+
+    items = []
+    for img in images:
+        resp = ImageResponse.model_validate(img)
+        resp.annotation_count = len(annotations[img.id])
+        resp.assigned_to = assignees.get(img.id)
+        items.append(ImageBundleItem(image=resp, annotations=annotations[img.id]))
+
+    return ImageBundleResponse(images=items)
+
+
+@router.get("/{image_id}/near-duplicates", response_model=list[NearDuplicateItem])
+async def list_near_duplicates(
+    project_id: uuid.UUID,
+    image_id: uuid.UUID,
+    radius: int = Query(settings.NEAR_DUPLICATE_RADIUS, ge=0, le=MAX_NEAR_DUPLICATE_RADIUS),
+    db: AsyncSession = Depends(get_read_db),
+    _admin: User = Depends(get_current_admin),
+):
+    result = await db.execute(select(Image).where(Image.id == image_id, Image.project_id == project_id))
+    image = result.scalar_one_or_none()
+    if not image:
+        raise HTTPException(status_code=404, detail="Image not found")
+
+    matches = await find_near_duplicates(db, project_id, image, radius)
+    return [
+        NearDuplicateItem(id=match.id, filename=match.filename, distance=distance)
+        for match, distance in matches
+    ]
+
+
 @router.get("/{image_id}/file")
 async def serve_image_file(
     project_id: uuid.UUID,
@@ -296,31 +444,34 @@ async def serve_image_file(
     if not image:
         raise HTTPException(status_code=404, detail="Image not found")
 
-    path = Path(image.storage_path)
-    if not path.exists():
-        raise HTTPException(status_code=404, detail="File not found on disk")
-
-    return FileResponse(path, media_type="image/jpeg")
+    return await _serve_stored_file(image.storage_path, image.filename, "File not found")
 
 
 @router.get("/{image_id}/thumbnail")
 async def serve_thumbnail(
     project_id: uuid.UUID,
     image_id: uuid.UUID,
+    size: int | None = Query(None, ge=1, description="Longest edge in pixels, rounded up to a configured size"),
+    accept: str | None = Header(None),
     db: AsyncSession = Depends(get_db),
     current_user: User = Depends(get_current_user_from_token_param),
 ):
     await _verify_project_access(project_id, current_user, db)
     result = await db.execute(select(Image).where(Image.id == image_id, Image.project_id == project_id))
     image = result.scalar_one_or_none()
-    if not image or not image.thumbnail_path:
+    if not image:
         raise HTTPException(status_code=404, detail="Thumbnail not found")
 
-    path = Path(image.thumbnail_path)
-    if not path.exists():
-        raise HTTPException(status_code=404, detail="Thumbnail file not found")
-
-    return FileResponse(path, media_type="image/jpeg")
+    fmt = negotiate_format(accept)
+    try:
+        path = await get_thumbnail(image, pick_size(size), fmt)
+    except FileNotFoundError:
+        raise HTTPException(status_code=404, detail="Image file not found")
+    return OffloadedFileResponse(
+        path,
+        media_type=MEDIA_TYPES[fmt],
+        headers={"Vary": "Accept", "Cache-Control": "private, max-age=86400"},
+    )
 
 
 @router.delete("/{image_id}", status_code=status.HTTP_204_NO_CONTENT)
@@ -335,13 +486,11 @@ async def delete_image(
     if not image:
         raise HTTPException(status_code=404, detail="Image not found")
 
-    for path_str in [image.storage_path, image.thumbnail_path]:
-        if path_str:
-            path = Path(path_str)
-            if path.exists():
-                path.unlink()
-
     await db.delete(image)
+    await db.flush()
+
+    # Files go once this transaction commits; a rollback keeps them
+    await enqueue_file_deletions(db, await release_image_files(db, image))
 
 
 @router.patch("/{image_id}/split", response_model=ImageResponse)
@@ -378,3 +527,4 @@ async def unassign_image(
     if not assignment:
         raise HTTPException(status_code=404, detail="Assignment not found")
     await db.delete(assignment)
+    await notify_change(db, "assignment", str(image_id))
@@ -0,0 +1,36 @@
+import uuid
+
+from fastapi import APIRouter, Depends, HTTPException, Request, status
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.database import get_db
+from app.models.user import User
+from app.models.project import Project
+from app.schemas.annotation import AnnotationImportResponse
+from app.services.import_service import ImportLineTooLong, import_annotations
+from app.api.deps import get_current_admin
+
+router = APIRouter(prefix="/api/projects/{project_id}/import", tags=["import"])
+
+
+@router.post(
+    "/annotations",
+    response_model=AnnotationImportResponse,
+    openapi_extra={"requestBody": {"required": True, "content": {"application/x-ndjson": {"schema": {"type": "string"}}}}},
+)
+async def import_project_annotations(
+    project_id: uuid.UUID,
+    request: Request,
+    db: AsyncSession = Depends(get_db),
+    admin: User = Depends(get_current_admin),
+):
+    """Replace the annotations of many images from an NDJSON body, one image per line."""
+    result = await db.execute(select(Project).where(Project.id == project_id))
+    if not result.scalar_one_or_none():
+        raise HTTPException(status_code=404, detail="Project not found")
+
+    try:
+        return await import_annotations(db, project_id, admin.id, request.stream())
+    except ImportLineTooLong as exc:
+        raise HTTPException(status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE, detail=str(exc))
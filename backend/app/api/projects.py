@@ -1,7 +1,7 @@
 import uuid
 
 from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy import select, func
+from sqlalchemy import select, func, delete
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.database import get_db
@@ -14,14 +14,17 @@ from app.schemas.project import (
     ProjectClassCreate, ProjectClassUpdate, ProjectClassResponse,
     ProjectMemberAdd, ProjectMemberResponse,
 )
-from app.api.deps import get_current_user, get_current_admin, get_project_member_or_admin
+from app.services.cache_service import get_project_classes, membership_key, notify_change
+from app.services.image_service import release_project_blobs
+from app.services.storage_gc import enqueue_legacy_project_files, reap_unreferenced_blobs
+from app.api.deps import get_current_user, get_current_admin, get_project_member_or_admin, get_read_db
 
 router = APIRouter(prefix="/api/projects", tags=["projects"])
 
 
 @router.get("", response_model=list[ProjectResponse])
 async def list_projects(
-    db: AsyncSession = Depends(get_db),
+    db: AsyncSession = Depends(get_read_db),
     current_user: User = Depends(get_current_user),
 ):
     if current_user.is_admin:
@@ -73,7 +76,7 @@ async def create_project(
 @router.get("/{project_id}", response_model=ProjectResponse)
 async def get_project(
     project_id: uuid.UUID,
-    db: AsyncSession = Depends(get_db),
+    db: AsyncSession = Depends(get_read_db),
     current_user: User = Depends(get_project_member_or_admin),
 ):
     result = await db.execute(select(Project).where(Project.id == project_id))
@@ -127,11 +130,23 @@ async def delete_project(
     db: AsyncSession = Depends(get_db),
     current_user: User = Depends(get_current_admin),
 ):
-    result = await db.execute(select(Project).where(Project.id == project_id))
-    project = result.scalar_one_or_none()
-    if not project:
+    result = await db.execute(select(Project.id).where(Project.id == project_id))
+    if result.scalar_one_or_none() is None:
         raise HTTPException(status_code=404, detail="Project not found")
-    await db.delete(project)
+    await release_project_blobs(db, project_id)
+    await enqueue_legacy_project_files(db, project_id)
+    # annotations.class_id has no ON DELETE CASCADE, so annotations go first; then
+    # ON DELETE CASCADE removes classes, members, images and assignments without loading any of them
+    await db.execute(
+        delete(Annotation)
+        .where(Annotation.image_id.in_(select(Image.id).where(Image.project_id == project_id)))
+        .execution_options(synchronize_session=False)
+    )
+    await db.execute(delete(Project).where(Project.id == project_id))
+    await reap_unreferenced_blobs(db)
+    await notify_change(db, "membership")
+    await notify_change(db, "assignment")
+    await notify_change(db, "classes", str(project_id))
 
 
 # --- Project Members ---
@@ -139,7 +154,7 @@ async def delete_project(
 @router.get("/{project_id}/members", response_model=list[ProjectMemberResponse])
 async def list_members(
     project_id: uuid.UUID,
-    db: AsyncSession = Depends(get_db),
+    db: AsyncSession = Depends(get_read_db),
     current_user: User = Depends(get_project_member_or_admin),
 ):
     result = await db.execute(
@@ -193,6 +208,7 @@ async def add_member(
     db.add(member)
     await db.flush()
     await db.refresh(member)
+    await notify_change(db, "membership", membership_key(project_id, data.user_id))
 
     return ProjectMemberResponse(
         user_id=member.user_id,
@@ -221,21 +237,16 @@ async def remove_member(
         raise HTTPException(status_code=404, detail="Member not found")
 
     # Also remove image assignments for this user in this project
-    images_result = await db.execute(
-        select(Image.id).where(Image.project_id == project_id)
-    )
-    image_ids = [row[0] for row in images_result.all()]
-    if image_ids:
-        assignments = await db.execute(
-            select(ImageAssignment).where(
-                ImageAssignment.image_id.in_(image_ids),
-                ImageAssignment.user_id == user_id,
-            )
+    await db.execute(
+        delete(ImageAssignment).where(
+            ImageAssignment.user_id == user_id,
+            ImageAssignment.image_id.in_(select(Image.id).where(Image.project_id == project_id)),
         )
-        for assignment in assignments.scalars().all():
-            await db.delete(assignment)
+    )
 
     await db.delete(member)
+    await notify_change(db, "membership", membership_key(project_id, user_id))
+    await notify_change(db, "assignment")
 
 
 # --- Project Classes ---
@@ -243,15 +254,10 @@ async def remove_member(
 @router.get("/{project_id}/classes", response_model=list[ProjectClassResponse])
 async def list_classes(
     project_id: uuid.UUID,
-    db: AsyncSession = Depends(get_db),
+    db: AsyncSession = Depends(get_read_db),
     current_user: User = Depends(get_project_member_or_admin),
 ):
-    result = await db.execute(
-        select(ProjectClass)
-        .where(ProjectClass.project_id == project_id)
-        .order_by(ProjectClass.class_index)
-    )
-    return result.scalars().all()
+    return await get_project_classes(db, project_id)
 
 
 @router.post("/{project_id}/classes", response_model=ProjectClassResponse, status_code=status.HTTP_201_CREATED)
@@ -279,6 +285,7 @@ async def create_class(
     db.add(cls)
     await db.flush()
     await db.refresh(cls)
+    await notify_change(db, "classes", str(project_id))
     return cls
 
 
@@ -304,6 +311,7 @@ async def update_class(
 
     await db.flush()
     await db.refresh(cls)
+    await notify_change(db, "classes", str(project_id))
     return cls
 
 
@@ -321,3 +329,4 @@ async def delete_class(
     if not cls:
         raise HTTPException(status_code=404, detail="Class not found")
     await db.delete(cls)
+    await notify_change(db, "classes", str(project_id))
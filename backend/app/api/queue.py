@@ -0,0 +1,63 @@
+import uuid
+
+from fastapi import APIRouter, Depends, HTTPException, Response, status
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.database import get_db
+from app.models.user import User
+from app.models.image import Image
+from app.schemas.image import ImageResponse, QueueClaimResponse, QueueLeaseResponse
+from app.services.cache_service import notify_change
+from app.services.queue_service import claim_next_image, current_claim, release_claim, renew_claim
+from app.api.deps import get_project_member_or_admin
+
+router = APIRouter(prefix="/api/projects/{project_id}/queue", tags=["queue"])
+
+
+@router.post("/next", response_model=QueueClaimResponse, responses={204: {"description": "Nothing left to annotate"}})
+async def claim_next(
+    project_id: uuid.UUID,
+    db: AsyncSession = Depends(get_db),
+    current_user: User = Depends(get_project_member_or_admin),
+):
+    """Claim the next unannotated image, or get back (and renew) the one already claimed and not yet annotated."""
+    claim = await current_claim(db, project_id, current_user.id)
+    if claim is None:
+        claim = await claim_next_image(db, project_id, current_user.id)
+        if claim is None:
+            return Response(status_code=status.HTTP_204_NO_CONTENT)
+        await notify_change(db, "assignment", str(claim[0]))
+
+    image_id, lease_expires_at = claim
+    result = await db.execute(select(Image).where(Image.id == image_id))
+    image = ImageResponse.model_validate(result.scalar_one())
+    image.assigned_to = current_user.username
+    return QueueClaimResponse(image=image, lease_expires_at=lease_expires_at)
+
+
+@router.post("/{image_id}/renew", response_model=QueueLeaseResponse)
+async def renew(
+    project_id: uuid.UUID,
+    image_id: uuid.UUID,
+    db: AsyncSession = Depends(get_db),
+    current_user: User = Depends(get_project_member_or_admin),
+):
+    """Keep a claimed image reserved while it is being annotated."""
+    lease_expires_at = await renew_claim(db, project_id, image_id, current_user.id)
+    if lease_expires_at is None:
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail="Image is no longer claimed by you")
+    return QueueLeaseResponse(lease_expires_at=lease_expires_at)
+
+
+@router.delete("/{image_id}", status_code=status.HTTP_204_NO_CONTENT)
+async def release(
+    project_id: uuid.UUID,
+    image_id: uuid.UUID,
+    db: AsyncSession = Depends(get_db),
+    current_user: User = Depends(get_project_member_or_admin),
+):
+    """Skip a claimed image, returning it to the queue."""
+    if not await release_claim(db, project_id, image_id, current_user.id):
+        raise HTTPException(status_code=404, detail="Claim not found")
+    await notify_change(db, "assignment", str(image_id))
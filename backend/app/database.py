@@ -1,10 +1,107 @@
-from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine, async_sessionmaker
-from sqlalchemy.orm import DeclarativeBase
+import itertools
+import time
+import uuid
+
+from sqlalchemy import event, func, select
+from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession, create_async_engine, async_sessionmaker
+from sqlalchemy.orm import DeclarativeBase, Session
 
 from app.config import settings
+from app.monitoring.db import InstrumentedPool, instrument_engine
+
+
+def _create_engine(url: str) -> AsyncEngine:
+    db_engine = create_async_engine(
+        url,
+        echo=False,
+        poolclass=InstrumentedPool,
+        pool_size=settings.DB_POOL_SIZE,
+        max_overflow=settings.DB_MAX_OVERFLOW,
+        pool_timeout=settings.DB_POOL_TIMEOUT,
+        pool_recycle=settings.DB_POOL_RECYCLE,
+        pool_pre_ping=settings.DB_POOL_PRE_PING,
+        connect_args={
+            "prepared_statement_cache_size": settings.DB_STATEMENT_CACHE_SIZE,
+            "command_timeout": settings.DB_COMMAND_TIMEOUT or None,
+        },
+    )
+    instrument_engine(db_engine.sync_engine)
+    return db_engine
+
+
+class AppSession(Session):
+    """Session that notes whether it wrote anything, for read-your-writes routing."""
+
+
+engine = _create_engine(settings.DATABASE_URL)
+replica_engines = [_create_engine(url) for url in settings.DATABASE_REPLICA_URLS]
+_next_replica = itertools.cycle(replica_engines)
+async_session = async_sessionmaker(
+    engine, class_=AsyncSession, sync_session_class=AppSession, expire_on_commit=False,
+)
+
+# Postgres NOTIFY channel for cross-worker cache invalidation (see app.services.cache_service)
+INVALIDATION_CHANNEL = "cache_invalidation"
+
+# user id -> monotonic time of that user's last committed write in this process
+_recent_writes: dict[uuid.UUID, float] = {}
+
+
+def record_write(user_id: uuid.UUID):
+    now = time.monotonic()
+    if len(_recent_writes) > 10000:
+        for uid, at in list(_recent_writes.items()):
+            if now - at > settings.READ_YOUR_WRITES_SECONDS:
+                del _recent_writes[uid]
+    _recent_writes[user_id] = now
+
+
+def read_engine_for(user_id: uuid.UUID | None = None) -> AsyncEngine:
+    """A replica, unless there are none or the user wrote recently enough that a replica may lag behind."""
+    if not replica_engines:
+        return engine
+    if user_id is not None:
+        wrote_at = _recent_writes.get(user_id)
+        if wrote_at is not None and time.monotonic() - wrote_at < settings.READ_YOUR_WRITES_SECONDS:
+            return engine
+    return next(_next_replica)
+
+
+def read_session(user_id: uuid.UUID | None = None) -> AsyncSession:
+    return async_session(bind=read_engine_for(user_id))
+
+
+@event.listens_for(AppSession, "after_flush")
+def _flushed(session, flush_context):
+    session.info["wrote"] = True
+
+
+@event.listens_for(AppSession, "do_orm_execute")
+def _executed(orm_execute_state):
+    if orm_execute_state.is_insert or orm_execute_state.is_update or orm_execute_state.is_delete:
+        orm_execute_state.session.info["wrote"] = True
+
+
+@event.listens_for(AppSession, "before_commit")
+def _announce_write(session):
+    # Other worker processes route this user's reads too; they learn of the write on commit
+    user_id = session.info.get("user_id")
+    if not replica_engines or user_id is None:
+        return
+    if session.info.get("wrote") or session.new or session.dirty or session.deleted:
+        session.execute(select(func.pg_notify(INVALIDATION_CHANNEL, f"write {user_id}")))
+
+
+@event.listens_for(AppSession, "after_commit")
+def _committed(session):
+    user_id = session.info.get("user_id")
+    if session.info.pop("wrote", False) and user_id is not None:
+        record_write(user_id)
+
 
-engine = create_async_engine(settings.DATABASE_URL, echo=False)
-async_session = async_sessionmaker(engine, class_=AsyncSession, expire_on_commit=False)
+@event.listens_for(AppSession, "after_rollback")
+def _rolled_back(session):
+    session.info.pop("wrote", None)
 
 
 class Base(DeclarativeBase):
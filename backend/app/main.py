@@ -1,55 +1,96 @@
+import asyncio
 from contextlib import asynccontextmanager
+from pathlib import Path
 
-from fastapi import FastAPI
+from alembic.config import Config
+from alembic.script import ScriptDirectory
+from fastapi import FastAPI, HTTPException, Request
 from fastapi.middleware.cors import CORSMiddleware
 from sqlalchemy import select, text
+from sqlalchemy.exc import ProgrammingError
 
-from app.api import auth, projects, images, annotations, export, admin
-from app.database import engine, Base, async_session
+from app.api import auth, projects, images, annotations, export, admin, queue, imports
+from app.database import engine, async_session
 from app.models import *  # noqa: F401, F403 - register all models
 from app.models.user import User
+from app.monitoring.db import QueryStatsMiddleware
+from app.monitoring.loop import run_loop_monitor
+from app.monitoring.metrics import PrometheusMiddleware, mark_worker_exited, metrics_allowed, metrics_response
 from app.services.auth_service import hash_password
+from app.services.cache_service import run_invalidation_listener
+from app.services.layout_migration import migrate_upload_layout
+from app.services.phash_backfill import backfill_phashes
+from app.services.process_pool import shutdown_process_pool
+from app.services.storage_gc import run_file_sweeper
+from app.services.thumbnail_service import run_thumbnail_cache_janitor
 from app.config import settings
 
+BACKEND_DIR = Path(__file__).resolve().parent.parent
 
-async def run_migrations():
-    """Add new columns to existing tables if they don't exist."""
-    async with engine.begin() as conn:
-        # Add is_admin column to users table if missing
-        await conn.execute(text(
-            "ALTER TABLE users ADD COLUMN IF NOT EXISTS is_admin BOOLEAN DEFAULT FALSE"
-        ))
-        # Promote existing project owners to admin
-        await conn.execute(text(
-            "UPDATE users SET is_admin = TRUE WHERE id IN (SELECT DISTINCT owner_id FROM projects)"
-        ))
+
+async def verify_schema():
+    """Refuse to start unless the database is at the migration head; migrations run before the workers."""
+    config = Config(str(BACKEND_DIR / "alembic.ini"))
+    config.set_main_option("script_location", str(BACKEND_DIR / "alembic"))
+    expected = set(ScriptDirectory.from_config(config).get_heads())
+    async with engine.connect() as conn:
+        try:
+            result = await conn.execute(text("SELECT version_num FROM alembic_version"))
+            current = set(result.scalars().all())
+        except ProgrammingError:
+            current = set()
+    if current != expected:
+        raise RuntimeError(
+            f"database schema is at {sorted(current) or 'no revision'}, expected {sorted(expected)}; "
+            "run 'alembic upgrade head'"
+        )
+
+
+# pg_advisory_xact_lock key so concurrently starting workers seed the admin only once
+SEED_ADMIN_LOCK = 0x616E6F02
 
 
 async def seed_admin():
     async with async_session() as db:
-        result = await db.execute(select(User).where(User.is_admin == True))  # noqa: E712
+        await db.execute(text("SELECT pg_advisory_xact_lock(:key)"), {"key": SEED_ADMIN_LOCK})
+        result = await db.execute(select(User.id).where(User.is_admin == True).limit(1))  # noqa: E712
         if result.scalar_one_or_none() is None:
             admin_user = User(
                 email=settings.ADMIN_EMAIL,
                 username="admin",
-                hashed_password=hash_password(settings.ADMIN_PASSWORD),
+                hashed_password=await hash_password(settings.ADMIN_PASSWORD),
                 is_admin=True,
             )
             db.add(admin_user)
-            await db.commit()
+        # Releases the lock whether or not there was anything to add
+        await db.commit()
 
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
-    async with engine.begin() as conn:
-        await conn.run_sync(Base.metadata.create_all)
-    await run_migrations()
+    await verify_schema()
     await seed_admin()
+    background = [
+        asyncio.create_task(run_loop_monitor()),
+        asyncio.create_task(run_invalidation_listener()),
+        asyncio.create_task(run_file_sweeper()),
+        asyncio.create_task(run_thumbnail_cache_janitor()),
+    ]
+    if settings.MIGRATE_UPLOAD_LAYOUT:
+        background.append(asyncio.create_task(migrate_upload_layout()))
+    if settings.BACKFILL_PHASH:
+        background.append(asyncio.create_task(backfill_phashes()))
     yield
+    for task in background:
+        task.cancel()
+    shutdown_process_pool()
+    mark_worker_exited()
 
 
 app = FastAPI(title="Image Annotation Tool", version="1.0.0", lifespan=lifespan)
 
+app.add_middleware(PrometheusMiddleware)
+app.add_middleware(QueryStatsMiddleware)
 app.add_middleware(
     CORSMiddleware,
     allow_origins=["http://localhost:5173", "http://localhost:3000"],
@@ -64,8 +105,17 @@ app.include_router(projects.router)
 app.include_router(images.router)
 app.include_router(annotations.router)
 app.include_router(export.router)
+app.include_router(queue.router)
+app.include_router(imports.router)
 
 
 @app.get("/api/health")
 async def health():
     return {"status": "ok"}
+
+
+@app.get("/metrics", include_in_schema=False)
+async def metrics(request: Request):
+    if not metrics_allowed(request, settings.METRICS_TOKEN):
+        raise HTTPException(status_code=403, detail="Not allowed")
+    return metrics_response()
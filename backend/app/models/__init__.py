@@ -1,6 +1,7 @@
 from app.models.user import User
 from app.models.project import Project, ProjectClass, ProjectMember
-from app.models.image import Image, ImageAssignment
+from app.models.image import Image, ImageAssignment, ImageBlob
 from app.models.annotation import Annotation
+from app.models.file_deletion import FileDeletion
 
-__all__ = ["User", "Project", "ProjectClass", "ProjectMember", "Image", "ImageAssignment", "Annotation"]
+__all__ = ["User", "Project", "ProjectClass", "ProjectMember", "Image", "ImageAssignment", "ImageBlob", "Annotation", "FileDeletion"]
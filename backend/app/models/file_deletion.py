@@ -0,0 +1,16 @@
+from datetime import datetime
+
+from sqlalchemy import BigInteger, String, DateTime, Identity, func
+from sqlalchemy.orm import Mapped, mapped_column
+
+from app.database import Base
+
+
+class FileDeletion(Base):
+    """Outbox of stored files to remove once the transaction that orphaned them has committed."""
+
+    __tablename__ = "file_deletions"
+
+    id: Mapped[int] = mapped_column(BigInteger, Identity(), primary_key=True)
+    storage_key: Mapped[str] = mapped_column(String(500), nullable=False)
+    enqueued_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), server_default=func.now())
@@ -1,15 +1,44 @@
 import uuid
 from datetime import datetime
 
-from sqlalchemy import String, Integer, BigInteger, DateTime, ForeignKey, UniqueConstraint, func
+from sqlalchemy import String, Integer, BigInteger, DateTime, ForeignKey, Index, UniqueConstraint, func, text
 from sqlalchemy.dialects.postgresql import UUID
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 
 from app.database import Base
 
 
+class ImageBlob(Base):
+    """A stored original shared by every Image with the same content hash."""
+
+    __tablename__ = "image_blobs"
+
+    content_hash: Mapped[str] = mapped_column(String(64), primary_key=True)
+    storage_path: Mapped[str] = mapped_column(String(500), nullable=False)
+    thumbnail_path: Mapped[str | None] = mapped_column(String(500), nullable=True)
+    width: Mapped[int] = mapped_column(Integer, nullable=False)
+    height: Mapped[int] = mapped_column(Integer, nullable=False)
+    file_size: Mapped[int] = mapped_column(BigInteger, nullable=False)
+    phash: Mapped[int | None] = mapped_column(BigInteger, nullable=True)
+    ref_count: Mapped[int] = mapped_column(Integer, nullable=False, default=0)
+    created_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), server_default=func.now())
+
+
 class Image(Base):
     __tablename__ = "images"
+    __table_args__ = (
+        UniqueConstraint("project_id", "content_hash", name="uq_image_project_content_hash"),
+        Index("ix_images_content_hash", "content_hash"),
+        # Also serves plain project_id lookups (alembic 0002)
+        Index("ix_images_project_split", "project_id", "dataset_split"),
+        Index("ix_images_project_uploaded", "project_id", "uploaded_at"),
+        Index("ix_images_phash_cluster", "project_id", "phash_cluster"),
+        # One index per 16-bit band of phash for multi-index hamming search (similarity_service)
+        *(
+            Index(f"ix_images_phash_band{band}", "project_id", text(f"((phash >> {band * 16}) & 65535)"))
+            for band in range(4)
+        ),
+    )
 
     id: Mapped[uuid.UUID] = mapped_column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
     project_id: Mapped[uuid.UUID] = mapped_column(UUID(as_uuid=True), ForeignKey("projects.id", ondelete="CASCADE"), nullable=False)
@@ -19,12 +48,15 @@ class Image(Base):
     width: Mapped[int] = mapped_column(Integer, nullable=False)
     height: Mapped[int] = mapped_column(Integer, nullable=False)
     file_size: Mapped[int] = mapped_column(BigInteger, nullable=False)
+    content_hash: Mapped[str | None] = mapped_column(String(64), ForeignKey("image_blobs.content_hash"), nullable=True)
+    phash: Mapped[int | None] = mapped_column(BigInteger, nullable=True)
+    phash_cluster: Mapped[uuid.UUID | None] = mapped_column(UUID(as_uuid=True), nullable=True)
     dataset_split: Mapped[str | None] = mapped_column(String(10), nullable=True)
     uploaded_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), server_default=func.now())
 
     project: Mapped["Project"] = relationship("Project", back_populates="images")
-    annotations: Mapped[list["Annotation"]] = relationship("Annotation", back_populates="image", cascade="all, delete-orphan")
-    assignment: Mapped["ImageAssignment | None"] = relationship("ImageAssignment", back_populates="image", uselist=False, cascade="all, delete-orphan")
+    annotations: Mapped[list["Annotation"]] = relationship("Annotation", back_populates="image", cascade="all, delete-orphan", passive_deletes=True)
+    assignment: Mapped["ImageAssignment | None"] = relationship("ImageAssignment", back_populates="image", uselist=False, cascade="all, delete-orphan", passive_deletes=True)
 
 
 class ImageAssignment(Base):
@@ -36,6 +68,8 @@ class ImageAssignment(Base):
     image_id: Mapped[uuid.UUID] = mapped_column(UUID(as_uuid=True), ForeignKey("images.id", ondelete="CASCADE"), primary_key=True)
     user_id: Mapped[uuid.UUID] = mapped_column(UUID(as_uuid=True), ForeignKey("users.id", ondelete="CASCADE"), nullable=False, index=True)
     assigned_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), server_default=func.now())
+    # Set for images claimed from the work queue; NULL for assignments made by an admin
+    lease_expires_at: Mapped[datetime | None] = mapped_column(DateTime(timezone=True), nullable=True)
 
     image: Mapped["Image"] = relationship("Image", back_populates="assignment")
     user: Mapped["User"] = relationship("User")
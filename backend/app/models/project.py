@@ -19,9 +19,9 @@ class Project(Base):
     updated_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
 
     owner: Mapped["User"] = relationship("User", back_populates="projects")
-    classes: Mapped[list["ProjectClass"]] = relationship("ProjectClass", back_populates="project", cascade="all, delete-orphan")
-    images: Mapped[list["Image"]] = relationship("Image", back_populates="project", cascade="all, delete-orphan")
-    members: Mapped[list["ProjectMember"]] = relationship("ProjectMember", back_populates="project", cascade="all, delete-orphan")
+    classes: Mapped[list["ProjectClass"]] = relationship("ProjectClass", back_populates="project", cascade="all, delete-orphan", passive_deletes=True)
+    images: Mapped[list["Image"]] = relationship("Image", back_populates="project", cascade="all, delete-orphan", passive_deletes=True)
+    members: Mapped[list["ProjectMember"]] = relationship("ProjectMember", back_populates="project", cascade="all, delete-orphan", passive_deletes=True)
 
 
 class ProjectClass(Base):
@@ -0,0 +1,196 @@
+"""Connection pool and query instrumentation.
+
+Pool checkouts are timed by the pool class itself, so wait time includes queueing
+behind other requests when the pool is exhausted. Queries are timed with cursor
+events and attributed to the current request through a context variable that
+QueryStatsMiddleware sets; SQLAlchemy runs the events in a greenlet that shares
+the calling task's context. All figures are per worker process. Slow-request,
+N+1 and tracing reports are in app.monitoring.profiler.
+"""
+import threading
+import time
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+
+from sqlalchemy import event, exc
+from sqlalchemy.engine import Engine
+from sqlalchemy.pool import AsyncAdaptedQueuePool
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from app.monitoring.metrics import DB_POOL_CHECKED_OUT, DB_POOL_WAIT, DB_QUERIES, DB_TIME
+from app.monitoring.profiler import TracedStatement, call_site, new_profile_id, report_request, should_profile
+
+
+@dataclass
+class RequestQueryStats:
+    queries: int = 0
+    seconds: float = 0.0
+    # statement text -> [count, seconds]
+    shapes: dict[str, list] = field(default_factory=dict)
+    # every statement with its call site, for profiled requests only
+    trace: list[TracedStatement] | None = None
+
+
+@dataclass
+class RouteQueryStats:
+    requests: int = 0
+    queries: int = 0
+    seconds: float = 0.0
+    max_queries: int = 0
+
+
+@dataclass
+class PoolWaitStats:
+    checkouts: int = 0
+    timeouts: int = 0
+    wait_seconds: float = 0.0
+    max_wait_seconds: float = 0.0
+    lock: threading.Lock = field(default_factory=threading.Lock, repr=False)
+
+    def record(self, seconds: float, timed_out: bool):
+        with self.lock:
+            self.checkouts += 1
+            self.timeouts += timed_out
+            self.wait_seconds += seconds
+            self.max_wait_seconds = max(self.max_wait_seconds, seconds)
+
+
+current_query_stats: ContextVar[RequestQueryStats | None] = ContextVar("current_query_stats", default=None)
+pool_wait_stats = PoolWaitStats()
+route_query_stats: dict[str, RouteQueryStats] = {}
+
+
+class InstrumentedPool(AsyncAdaptedQueuePool):
+    """Queue pool that records how long each checkout waited for a connection."""
+
+    def connect(self):
+        start = time.perf_counter()
+        timed_out = False
+        try:
+            return super().connect()
+        except exc.TimeoutError:
+            timed_out = True
+            raise
+        finally:
+            waited = time.perf_counter() - start
+            pool_wait_stats.record(waited, timed_out)
+            DB_POOL_WAIT.observe(waited)
+
+
+def instrument_engine(engine: Engine):
+    """Attach query timing to a (sync) engine, e.g. ``async_engine.sync_engine``."""
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def _before(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("query_start", []).append(time.perf_counter())
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def _after(conn, cursor, statement, parameters, context, executemany):
+        elapsed = time.perf_counter() - conn.info["query_start"].pop()
+        stats = current_query_stats.get()
+        if stats is not None:
+            stats.queries += 1
+            stats.seconds += elapsed
+            shape = stats.shapes.get(statement)
+            if shape is None:
+                stats.shapes[statement] = [1, elapsed]
+            else:
+                shape[0] += 1
+                shape[1] += elapsed
+            if stats.trace is not None:
+                stats.trace.append(TracedStatement(statement, elapsed, call_site()))
+
+    @event.listens_for(engine, "checkout")
+    def _checkout(dbapi_connection, connection_record, connection_proxy):
+        DB_POOL_CHECKED_OUT.inc()
+
+    @event.listens_for(engine, "checkin")
+    def _checkin(dbapi_connection, connection_record):
+        DB_POOL_CHECKED_OUT.dec()
+
+    @event.listens_for(engine, "handle_error")
+    def _error(context):
+        if context.connection is not None and context.connection.info.get("query_start"):
+            context.connection.info["query_start"].pop()
+
+
+def pool_status(engine: Engine) -> dict:
+    pool = engine.pool
+    with pool_wait_stats.lock:
+        waits = {
+            "checkouts": pool_wait_stats.checkouts,
+            "timeouts": pool_wait_stats.timeouts,
+            "wait_seconds_total": round(pool_wait_stats.wait_seconds, 6),
+            "wait_seconds_mean": round(pool_wait_stats.wait_seconds / pool_wait_stats.checkouts, 6)
+            if pool_wait_stats.checkouts else 0.0,
+            "wait_seconds_max": round(pool_wait_stats.max_wait_seconds, 6),
+        }
+    return {
+        "size": pool.size(),
+        "checked_out": pool.checkedout(),
+        "checked_in": pool.checkedin(),
+        "overflow": pool.overflow(),
+        **waits,
+    }
+
+
+def route_stats() -> list[dict]:
+    return sorted(
+        (
+            {
+                "route": route,
+                "requests": stats.requests,
+                "queries_mean": round(stats.queries / stats.requests, 2),
+                "queries_max": stats.max_queries,
+                "db_seconds_mean": round(stats.seconds / stats.requests, 6),
+            }
+            for route, stats in route_query_stats.items()
+        ),
+        key=lambda item: item["queries_mean"] * item["requests"],
+        reverse=True,
+    )
+
+
+class QueryStatsMiddleware:
+    """Counts queries per request, aggregates them per route and reports them in Server-Timing.
+
+    Profiled requests get an X-SQL-Profile header naming their stored trace.
+    """
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        profile_id = new_profile_id() if should_profile(scope) else None
+        stats = RequestQueryStats(trace=[] if profile_id else None)
+        token = current_query_stats.set(stats)
+        start = time.perf_counter()
+
+        async def send_with_timing(message: Message):
+            if message["type"] == "http.response.start":
+                timing = f'db;dur={stats.seconds * 1000:.1f};desc="{stats.queries} queries"'
+                headers = [*message.get("headers", []), (b"server-timing", timing.encode())]
+                if profile_id:
+                    headers.append((b"x-sql-profile", profile_id.encode()))
+                message["headers"] = headers
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_timing)
+        finally:
+            current_query_stats.reset(token)
+            elapsed = time.perf_counter() - start
+            route = scope.get("route")
+            path = route.path if route is not None else "unmatched"
+            report_request(scope["method"], path, elapsed, stats, profile_id)
+            DB_QUERIES.labels(scope["method"], path).observe(stats.queries)
+            DB_TIME.labels(scope["method"], path).inc(stats.seconds)
+            key = f"{scope['method']} {route.path}" if route is not None else "unmatched"
+            totals = route_query_stats.setdefault(key, RouteQueryStats())
+            totals.requests += 1
+            totals.queries += stats.queries
+            totals.seconds += stats.seconds
+            totals.max_queries = max(totals.max_queries, stats.queries)
@@ -0,0 +1,63 @@
+"""Event-loop lag monitoring.
+
+A task sleeps for a fixed interval and records how late it wakes up: that delay is
+time the loop spent running something else without yielding. With
+LOOP_BLOCK_TRACE on, a watchdog thread also notices when the task stops ticking
+and logs the loop thread's stack while it is still blocked, which points at the
+synchronous call responsible.
+"""
+import asyncio
+import logging
+import sys
+import threading
+import time
+import traceback
+
+from app.config import settings
+from app.monitoring.metrics import EVENT_LOOP_BLOCKS, EVENT_LOOP_LAG
+
+logger = logging.getLogger(__name__)
+
+_last_tick = time.monotonic()
+
+
+def _watchdog(loop_thread_id: int, tick: float, stop: threading.Event):
+    threshold = settings.LOOP_BLOCK_THRESHOLD
+    reported_tick = None
+    while not stop.wait(threshold / 4):
+        last_tick = _last_tick
+        blocked_for = time.monotonic() - last_tick - tick
+        if blocked_for < threshold or reported_tick == last_tick:
+            continue
+        reported_tick = last_tick
+        frame = sys._current_frames().get(loop_thread_id)
+        if frame is None:
+            continue
+        logger.warning(
+            "Event loop blocked for %.0f ms so far in:\n%s",
+            blocked_for * 1000, "".join(traceback.format_stack(frame)),
+        )
+
+
+async def run_loop_monitor():
+    global _last_tick
+    interval = settings.LOOP_LAG_INTERVAL
+    stop = threading.Event()
+    _last_tick = time.monotonic()
+    if settings.LOOP_BLOCK_TRACE:
+        # Tick often enough that a block is caught while it is still in progress
+        interval = min(interval, settings.LOOP_BLOCK_THRESHOLD / 2)
+        threading.Thread(
+            target=_watchdog, args=(threading.get_ident(), interval, stop), name="loop-watchdog", daemon=True,
+        ).start()
+    try:
+        while True:
+            start = time.perf_counter()
+            await asyncio.sleep(interval)
+            lag = max(0.0, time.perf_counter() - start - interval)
+            _last_tick = time.monotonic()
+            EVENT_LOOP_LAG.observe(lag)
+            if lag >= settings.LOOP_BLOCK_THRESHOLD:
+                EVENT_LOOP_BLOCKS.inc()
+    finally:
+        stop.set()
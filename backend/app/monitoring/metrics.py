@@ -0,0 +1,118 @@
+"""Prometheus metrics, served at /metrics.
+
+Set PROMETHEUS_MULTIPROC_DIR (an empty directory, cleared at startup) when
+running several worker processes, so a scrape of any worker reports the sum
+over all of them. prometheus_client reads it from the process environment when
+it is imported, so it has to be exported before the server starts; start.sh
+does that for more than one worker. A .env entry is not seen.
+
+/metrics answers scrapers that send METRICS_TOKEN as a bearer token and, when
+no token is set, only clients on the loopback interface.
+"""
+import hmac
+import os
+import time
+from collections.abc import AsyncIterator
+
+from prometheus_client import (
+    CONTENT_TYPE_LATEST, CollectorRegistry, Counter, Gauge, Histogram, generate_latest, multiprocess,
+)
+from starlette.requests import Request
+from starlette.responses import Response
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+REQUEST_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+HTTP_REQUESTS = Counter("http_requests_total", "HTTP requests", ["method", "route", "status"])
+HTTP_LATENCY = Histogram(
+    "http_request_duration_seconds", "Time to fully send the response", ["method", "route"],
+    buckets=REQUEST_BUCKETS,
+)
+DB_QUERIES = Histogram(
+    "http_request_db_queries", "Database queries issued per request", ["method", "route"],
+    buckets=(0, 1, 2, 5, 10, 20, 50, 100, 200, 500),
+)
+DB_TIME = Counter("http_request_db_seconds_total", "Time spent in database queries", ["method", "route"])
+DB_POOL_CHECKED_OUT = Gauge(
+    "db_pool_checked_out_connections", "Connections currently checked out", multiprocess_mode="livesum",
+)
+DB_POOL_WAIT = Histogram(
+    "db_pool_wait_seconds", "Time to obtain a connection from the pool",
+    buckets=(0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0, 5.0, 10.0),
+)
+EVENT_LOOP_LAG = Histogram(
+    "event_loop_lag_seconds", "How late the event loop ran a timer scheduled for now",
+    buckets=(0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0),
+)
+EVENT_LOOP_BLOCKS = Counter("event_loop_blocks_total", "Lag samples at or above LOOP_BLOCK_THRESHOLD")
+UPLOAD_BYTES = Counter("upload_bytes_total", "Bytes received in image uploads")
+EXPORT_DURATION = Histogram(
+    "export_duration_seconds", "Time to produce a dataset export", ["format"],
+    buckets=(0.5, 1, 2.5, 5, 10, 30, 60, 120, 300, 600, 1800),
+)
+THUMBNAIL_RENDER = Histogram(
+    "thumbnail_render_seconds", "Time to render a thumbnail variant", ["format"],
+    buckets=(0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5),
+)
+THUMBNAIL_CACHE = Counter("thumbnail_cache_requests_total", "Thumbnail cache lookups", ["result"])
+
+
+def metrics_allowed(request: Request, token: str) -> bool:
+    if token:
+        return hmac.compare_digest(request.headers.get("authorization", ""), f"Bearer {token}")
+    return request.client is not None and request.client.host in ("127.0.0.1", "::1")
+
+
+def metrics_response() -> Response:
+    if "PROMETHEUS_MULTIPROC_DIR" in os.environ:
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+        data = generate_latest(registry)
+    else:
+        data = generate_latest()
+    return Response(data, media_type=CONTENT_TYPE_LATEST)
+
+
+def mark_worker_exited():
+    """Drop this worker's live gauges from multiprocess totals."""
+    if "PROMETHEUS_MULTIPROC_DIR" in os.environ:
+        multiprocess.mark_process_dead(os.getpid())
+
+
+async def timed_export(stream: AsyncIterator[bytes], export_format: str) -> AsyncIterator[bytes]:
+    """Pass a streamed export through, recording how long it took once it has been sent."""
+    start = time.perf_counter()
+    async for chunk in stream:
+        yield chunk
+    EXPORT_DURATION.labels(export_format).observe(time.perf_counter() - start)
+
+
+class PrometheusMiddleware:
+    """Request counts and latency per route template; DB figures come from QueryStatsMiddleware."""
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        status_code = 500
+        start = time.perf_counter()
+
+        async def send_wrapper(message: Message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            elapsed = time.perf_counter() - start
+            route = scope.get("route")
+            # Route templates keep label cardinality bounded; unmatched paths share one label
+            path = route.path if route is not None else "unmatched"
+            method = scope["method"]
+            HTTP_REQUESTS.labels(method, path, str(status_code)).inc()
+            HTTP_LATENCY.labels(method, path).observe(elapsed)
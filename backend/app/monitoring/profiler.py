@@ -0,0 +1,142 @@
+"""Per-request SQL profiling, slow-request logging and N+1 detection.
+
+Every request keeps a cheap per-statement tally (count and time per distinct SQL
+string); since parameters are bound, the string is the statement's shape. That
+tally feeds the slow-request log and the N+1 check. Requests that opt in with
+the X-Profile-SQL header (when SQL_PROFILE_HEADER is on) or are sampled via
+SQL_PROFILE_SAMPLE_RATE additionally record each statement with its duration
+and the application line that issued it; those traces are kept in memory and
+listed under /api/admin/metrics/profiles.
+"""
+import logging
+import random
+import sys
+import time
+import uuid
+from collections import OrderedDict
+from dataclasses import dataclass
+from pathlib import Path
+
+import greenlet
+
+from app.config import settings
+
+logger = logging.getLogger(__name__)
+
+PROFILE_HEADER = b"x-profile-sql"
+MAX_KEPT_PROFILES = 100
+TOP_STATEMENTS = 5
+
+APP_DIR = Path(__file__).resolve().parent.parent
+_SKIP_DIR = str(Path(__file__).resolve().parent)
+_APP_PREFIX = str(APP_DIR)
+
+recent_profiles: OrderedDict[str, dict] = OrderedDict()
+
+
+@dataclass
+class TracedStatement:
+    statement: str
+    seconds: float
+    call_site: str | None
+
+
+def should_profile(scope) -> bool:
+    if settings.SQL_PROFILE_SAMPLE_RATE and random.random() < settings.SQL_PROFILE_SAMPLE_RATE:
+        return True
+    if settings.SQL_PROFILE_HEADER:
+        return any(name == PROFILE_HEADER and value in (b"1", b"true") for name, value in scope["headers"])
+    return False
+
+
+def _app_frame(frame) -> str | None:
+    while frame is not None:
+        filename = frame.f_code.co_filename
+        if filename.startswith(_APP_PREFIX) and not filename.startswith(_SKIP_DIR):
+            return f"{Path(filename).relative_to(APP_DIR.parent)}:{frame.f_lineno} in {frame.f_code.co_name}"
+        frame = frame.f_back
+    return None
+
+
+def call_site() -> str | None:
+    """The innermost application frame behind the statement being executed.
+
+    Cursor events run inside the greenlet SQLAlchemy spawns for each awaited call,
+    whose stack starts at the ORM; the awaiting coroutines are on its parent's stack.
+    """
+    site = _app_frame(sys._getframe(1))
+    if site is None:
+        parent = greenlet.getcurrent().parent
+        if parent is not None:
+            site = _app_frame(parent.gr_frame)
+    return site
+
+
+def _top_statements(shapes: dict[str, list]) -> list[dict]:
+    ranked = sorted(shapes.items(), key=lambda item: item[1][1], reverse=True)[:TOP_STATEMENTS]
+    return [
+        {"statement": statement, "count": count, "seconds": round(seconds, 6)}
+        for statement, (count, seconds) in ranked
+    ]
+
+
+def _short(statement: str, limit: int = 200) -> str:
+    statement = " ".join(statement.split())
+    return statement if len(statement) <= limit else statement[:limit] + "..."
+
+
+def new_profile_id() -> str:
+    return uuid.uuid4().hex[:16]
+
+
+def report_request(method: str, route: str, elapsed: float, stats, profile_id: str | None = None):
+    """Log slow requests and repeated statements, and keep the trace of a profiled request."""
+    repeated = {
+        statement: entry for statement, entry in stats.shapes.items()
+        if entry[0] >= settings.SQL_REPEAT_THRESHOLD
+    }
+    for statement, (count, seconds) in repeated.items():
+        logger.warning(
+            "Possible N+1 in %s %s: statement ran %d times (%.1f ms): %s",
+            method, route, count, seconds * 1000, _short(statement),
+        )
+
+    if elapsed >= settings.SLOW_REQUEST_SECONDS:
+        top = "\n".join(
+            f"  {item['count']}x {item['seconds'] * 1000:.1f} ms  {_short(item['statement'])}"
+            for item in _top_statements(stats.shapes)
+        )
+        logger.warning(
+            "Slow request %s %s: %.0f ms, %d queries, %.0f ms in database%s",
+            method, route, elapsed * 1000, stats.queries, stats.seconds * 1000, f"\n{top}" if top else "",
+        )
+
+    if profile_id is not None and stats.trace is not None:
+        recent_profiles[profile_id] = {
+            "id": profile_id,
+            "method": method,
+            "route": route,
+            "at": time.time(),
+            "duration_ms": round(elapsed * 1000, 3),
+            "queries": stats.queries,
+            "db_ms": round(stats.seconds * 1000, 3),
+            "repeated": [
+                {"statement": statement, "count": count, "seconds": round(seconds, 6)}
+                for statement, (count, seconds) in repeated.items()
+            ],
+            "top": _top_statements(stats.shapes),
+            "statements": [
+                {"statement": item.statement, "ms": round(item.seconds * 1000, 3), "call_site": item.call_site}
+                for item in stats.trace
+            ],
+        }
+        while len(recent_profiles) > MAX_KEPT_PROFILES:
+            recent_profiles.popitem(last=False)
+
+
+def profile_summaries() -> list[dict]:
+    return [
+        {key: profile[key] for key in ("id", "method", "route", "at", "duration_ms", "queries", "db_ms")}
+        | {"repeated_statements": len(profile["repeated"])}
+        for profile in reversed(recent_profiles.values())
+    ]
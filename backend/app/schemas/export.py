@@ -1,9 +1,14 @@
+from typing import Literal
+
 from pydantic import BaseModel
 
 
 class ExportRequest(BaseModel):
-    pass
+    format: Literal["yolo", "coco", "masks"] = "yolo"
 
 
 class DatasetSplitRequest(BaseModel):
     train_ratio: float = 0.8
+    val_ratio: float | None = None  # defaults to everything not in train (no test split)
+    seed: int = 0
+    mode: Literal["hash", "stratified", "cluster"] = "hash"
@@ -1,7 +1,9 @@
 import uuid
 from datetime import datetime
 
-from pydantic import BaseModel
+from pydantic import BaseModel, Field
+
+from app.schemas.annotation import AnnotationResponse
 
 
 class ImageResponse(BaseModel):
@@ -13,14 +15,34 @@ class ImageResponse(BaseModel):
     file_size: int
     dataset_split: str | None
     uploaded_at: datetime
+    content_hash: str | None = None
     annotation_count: int = 0
     assigned_to: str | None = None
+    duplicate: bool = False
 
     model_config = {"from_attributes": True}
 
 
+class QueueClaimResponse(BaseModel):
+    image: ImageResponse
+    lease_expires_at: datetime
+
+
+class QueueLeaseResponse(BaseModel):
+    lease_expires_at: datetime
+
+
+class ImageBundleItem(BaseModel):
+    image: ImageResponse
+    annotations: list[AnnotationResponse]
+
+
+class ImageBundleResponse(BaseModel):
+    images: list[ImageBundleItem]
+
+
 class ImageSplitUpdate(BaseModel):
-    dataset_split: str | None  # "train", "val", or null
+    dataset_split: str | None  # "train", "val", "test", or null
 
 
 class ImageAssignRequest(BaseModel):
@@ -38,3 +60,22 @@ class AssignmentStatsItem(BaseModel):
     username: str
     assigned: int
     annotated: int
+
+
+class NearDuplicateItem(BaseModel):
+    id: uuid.UUID
+    filename: str
+    distance: int
+
+
+class ImageClusterItem(BaseModel):
+    cluster_id: uuid.UUID
+    image_ids: list[uuid.UUID]
+    size: int
+
+
+class ThumbnailBatchRequest(BaseModel):
+    image_ids: list[uuid.UUID] | None = Field(None, max_length=1000)  # None: a page of the image listing
+    skip: int = Field(0, ge=0)
+    limit: int = Field(500, ge=1, le=1000)
+    size: int | None = Field(None, ge=1)
@@ -1,3 +1,5 @@
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta, timezone
 
 from jose import JWTError, jwt
@@ -7,13 +9,29 @@ from app.config import settings
 
 pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 
+# bcrypt releases the GIL, so a few threads hash in parallel without stalling the event loop
+_hash_executor = ThreadPoolExecutor(max_workers=settings.PASSWORD_HASH_WORKERS, thread_name_prefix="password-hash")
+# Hashes running or queued; beyond this, callers are turned away instead of queueing indefinitely
+_hash_slots = asyncio.Semaphore(settings.PASSWORD_HASH_WORKERS + settings.PASSWORD_HASH_QUEUE)
 
-def hash_password(password: str) -> str:
-    return pwd_context.hash(password)
 
+class PasswordHashingBusy(Exception):
+    """Too many password hashes are already queued."""
 
-def verify_password(plain_password: str, hashed_password: str) -> bool:
-    return pwd_context.verify(plain_password, hashed_password)
+
+async def _run_hash(fn, *args):
+    if _hash_slots.locked():
+        raise PasswordHashingBusy()
+    async with _hash_slots:
+        return await asyncio.get_running_loop().run_in_executor(_hash_executor, fn, *args)
+
+
+async def hash_password(password: str) -> str:
+    return await _run_hash(pwd_context.hash, password)
+
+
+async def verify_password(plain_password: str, hashed_password: str) -> bool:
+    return await _run_hash(pwd_context.verify, plain_password, hashed_password)
 
 
 def create_access_token(user_id: str) -> str:
@@ -0,0 +1,198 @@
+"""Per-process caches of users, memberships, assignments and project classes.
+
+Every worker process keeps its own copies, so changes are broadcast with
+Postgres LISTEN/NOTIFY: writers call notify_change() inside the transaction
+that changes the data, Postgres delivers the notification to every worker's
+listener only if that transaction commits, and each worker drops the entry.
+Entries also expire after CACHE_TTL_SECONDS. While a worker's listener is not
+connected it bypasses its caches, so it never serves something it could have
+missed an invalidation for.
+"""
+import asyncio
+import logging
+import time
+import uuid
+from collections.abc import Awaitable, Callable
+from typing import Any
+
+import asyncpg
+from sqlalchemy import func, select
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.config import settings
+from app.database import INVALIDATION_CHANNEL, engine, record_write
+from app.models.image import ImageAssignment
+from app.models.project import ProjectClass, ProjectMember
+from app.models.user import User
+from app.schemas.project import ProjectClassResponse
+
+logger = logging.getLogger(__name__)
+
+LISTENER_PING_INTERVAL = 30.0
+LISTENER_RETRY_DELAY = 5.0
+
+_MISSING = object()
+
+
+class TTLCache:
+    def __init__(self, ttl: float, max_entries: int = 10000):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        # Bumped by every eviction, so a value loaded before an eviction isn't stored after it
+        self.version = 0
+        self._entries: dict[str, tuple[float, Any]] = {}
+
+    def get(self, key: str, default=None):
+        entry = self._entries.get(key)
+        if entry is None or entry[0] < time.monotonic():
+            return default
+        return entry[1]
+
+    def set(self, key: str, value, version: int):
+        if version != self.version:
+            return
+        if len(self._entries) >= self.max_entries:
+            now = time.monotonic()
+            self._entries = {k: entry for k, entry in self._entries.items() if entry[0] >= now}
+            if len(self._entries) >= self.max_entries:
+                self._entries.clear()
+        self._entries[key] = (time.monotonic() + self.ttl, value)
+
+    def pop(self, key: str):
+        self.version += 1
+        self._entries.pop(key, None)
+
+    def clear(self):
+        self.version += 1
+        self._entries.clear()
+
+
+caches = {
+    kind: TTLCache(settings.CACHE_TTL_SECONDS)
+    for kind in ("user", "membership", "assignment", "classes")
+}
+_listening = False
+
+
+async def _cached(db: AsyncSession, kind: str, key: str, load: Callable[[], Awaitable[Any]]):
+    if not _listening:
+        return await load()
+    cache = caches[kind]
+    value = cache.get(key, _MISSING)
+    if value is _MISSING:
+        version = cache.version
+        value = await load()
+        # Only values read from the primary are kept: a replica may not have
+        # replayed the change an eviction was for yet
+        if db.bind in (None, engine):
+            cache.set(key, value, version)
+    return value
+
+
+def _evict(kind: str, key: str):
+    if kind == "write":
+        record_write(uuid.UUID(key))
+        return
+    cache = caches.get(kind)
+    if cache is None:
+        return
+    if key == "*":
+        cache.clear()
+    else:
+        cache.pop(key)
+
+
+async def notify_change(db: AsyncSession, kind: str, key: str = "*"):
+    """Drop a cache entry ("*" for the whole cache) here now, and in every worker once db commits."""
+    _evict(kind, key)
+    await db.execute(select(func.pg_notify(INVALIDATION_CHANNEL, f"{kind} {key}")))
+
+
+def membership_key(project_id: uuid.UUID, user_id: uuid.UUID) -> str:
+    return f"{project_id}:{user_id}"
+
+
+async def get_user_row(db: AsyncSession, user_id: uuid.UUID) -> dict | None:
+    """Column values of a user, or None if there is no such user."""
+    async def load():
+        result = await db.execute(select(*User.__table__.columns).where(User.id == user_id))
+        row = result.mappings().one_or_none()
+        return dict(row) if row is not None else None
+
+    return await _cached(db, "user", str(user_id), load)
+
+
+async def is_project_member(db: AsyncSession, project_id: uuid.UUID, user_id: uuid.UUID) -> bool:
+    async def load():
+        result = await db.execute(
+            select(ProjectMember.user_id).where(
+                ProjectMember.project_id == project_id,
+                ProjectMember.user_id == user_id,
+            )
+        )
+        return result.scalar_one_or_none() is not None
+
+    return await _cached(db, "membership", membership_key(project_id, user_id), load)
+
+
+async def get_assignee(db: AsyncSession, image_id: uuid.UUID) -> uuid.UUID | None:
+    async def load():
+        result = await db.execute(select(ImageAssignment.user_id).where(ImageAssignment.image_id == image_id))
+        return result.scalar_one_or_none()
+
+    return await _cached(db, "assignment", str(image_id), load)
+
+
+async def get_project_classes(db: AsyncSession, project_id: uuid.UUID) -> list[ProjectClassResponse]:
+    async def load():
+        result = await db.execute(
+            select(ProjectClass)
+            .where(ProjectClass.project_id == project_id)
+            .order_by(ProjectClass.class_index)
+        )
+        return [ProjectClassResponse.model_validate(cls) for cls in result.scalars().all()]
+
+    return await _cached(db, "classes", str(project_id), load)
+
+
+def _stop_serving(connection):
+    global _listening
+    _listening = False
+
+
+def _on_notification(connection, pid, channel, payload: str):
+    kind, _, key = payload.partition(" ")
+    try:
+        _evict(kind, key)
+    except ValueError:
+        logger.warning("ignoring malformed invalidation %r", payload)
+
+
+async def run_invalidation_listener():
+    """Keep a LISTEN connection open until cancelled, reconnecting when it drops."""
+    global _listening
+    dsn = make_url(settings.DATABASE_URL).set(drivername="postgresql").render_as_string(hide_password=False)
+    while True:
+        try:
+            conn = await asyncpg.connect(dsn)
+        except (OSError, asyncpg.PostgresError):
+            logger.warning("cache invalidation listener cannot connect, retrying", exc_info=True)
+            await asyncio.sleep(LISTENER_RETRY_DELAY)
+            continue
+        try:
+            conn.add_termination_listener(_stop_serving)
+            await conn.add_listener(INVALIDATION_CHANNEL, _on_notification)
+            # Anything may have changed while nobody was listening
+            for cache in caches.values():
+                cache.clear()
+            _listening = True
+            while True:
+                await asyncio.sleep(LISTENER_PING_INTERVAL)
+                await conn.execute("SELECT 1")
+        except (OSError, asyncpg.PostgresError, asyncpg.InterfaceError):
+            logger.warning("cache invalidation listener lost its connection, reconnecting", exc_info=True)
+        finally:
+            _listening = False
+            if not conn.is_closed():
+                conn.terminate()
@@ -1,29 +1,121 @@
+import asyncio
 import io
+import json
 import os
-import random
 import uuid
 import zipfile
+from collections import defaultdict, deque
+from collections.abc import AsyncIterator, Callable
+from datetime import datetime, timezone
 from pathlib import Path
 
-from sqlalchemy import select, update
+from sqlalchemy import BigInteger, String, case, cast, func, literal, select, update
+from sqlalchemy.dialects.postgresql import BIT
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import selectinload
 
+from app.database import async_session
 from app.models.image import Image
 from app.models.annotation import Annotation
 from app.models.project import Project, ProjectClass
+from app.services.mask_service import rasterize_masks
+from app.services.process_pool import process_pool_size, run_in_process
+from app.services.storage import get_storage
+from app.utils.zipstream import ZipStream
 
 
-async def auto_split_dataset(db: AsyncSession, project_id: uuid.UUID, train_ratio: float = 0.8):
-    result = await db.execute(select(Image).where(Image.project_id == project_id))
-    images = list(result.scalars().all())
-    random.shuffle(images)
+SPLIT_NAMES = ("train", "val", "test")
 
-    split_point = int(len(images) * train_ratio)
-    for i, img in enumerate(images):
-        img.dataset_split = "train" if i < split_point else "val"
 
-    await db.flush()
+def _split_hash(image_id, seed: int):
+    """md5 hex digest of ``"<seed>:<image id>"``; stable across runs and PostgreSQL versions."""
+    return func.md5(literal(f"{seed}:") + cast(image_id, String))
+
+
+def _split_bucket(image_id, seed: int):
+    """Map an image id to a deterministic value in [0, 1) using the first 32 bits of its split hash."""
+    prefix = literal("x") + func.substr(_split_hash(image_id, seed), 1, 8)
+    return cast(cast(prefix, BIT(32)), BigInteger) / 4294967296.0
+
+
+def _split_case(position, train_ratio: float, val_ratio: float):
+    return case(
+        (position < train_ratio, "train"),
+        (position < train_ratio + val_ratio, "val"),
+        else_="test",
+    )
+
+
+async def auto_split_dataset(
+    db: AsyncSession,
+    project_id: uuid.UUID,
+    train_ratio: float = 0.8,
+    val_ratio: float | None = None,
+    seed: int = 0,
+    mode: str = "hash",
+):
+    """Assign train/val/test splits to every image of the project in a single UPDATE.
+
+    ``hash`` mode places each image by a seeded hash of its id, so re-running
+    with the same seed reproduces the split and new images never move old ones.
+    ``stratified`` mode groups images by their rarest annotated class (plus one
+    group for unannotated images) and cuts each group at the requested ratios
+    in hash order, so every class is spread across splits in proportion.
+    ``cluster`` mode hashes the near-duplicate cluster instead of the image, so
+    every member of a cluster lands in the same split and similar frames
+    cannot leak between train and val. Whatever is left after train and val
+    goes to test.
+    """
+    if val_ratio is None:
+        val_ratio = 1.0 - train_ratio
+
+    if mode == "stratified":
+        class_totals = (
+            select(Annotation.class_id, func.count().label("total"))
+            .join(Image, Annotation.image_id == Image.id)
+            .where(Image.project_id == project_id)
+            .group_by(Annotation.class_id)
+            .cte("class_totals")
+        )
+        image_strata = (
+            select(Annotation.image_id, Annotation.class_id)
+            .join(Image, Annotation.image_id == Image.id)
+            .join(class_totals, class_totals.c.class_id == Annotation.class_id)
+            .where(Image.project_id == project_id)
+            .distinct(Annotation.image_id)
+            .order_by(Annotation.image_id, class_totals.c.total, Annotation.class_id)
+            .cte("image_strata")
+        )
+        stratum = image_strata.c.class_id
+        position = (
+            (func.row_number().over(partition_by=stratum, order_by=_split_hash(Image.id, seed)) - 0.5)
+            / func.count().over(partition_by=stratum)
+        )
+        ranked = (
+            select(Image.id, position.label("position"))
+            .outerjoin(image_strata, image_strata.c.image_id == Image.id)
+            .where(Image.project_id == project_id)
+            .cte("ranked")
+        )
+        stmt = (
+            update(Image)
+            .where(Image.id == ranked.c.id)
+            .values(dataset_split=_split_case(ranked.c.position, train_ratio, val_ratio))
+        )
+    else:
+        split_key = func.coalesce(Image.phash_cluster, Image.id) if mode == "cluster" else Image.id
+        stmt = (
+            update(Image)
+            .where(Image.project_id == project_id)
+            .values(dataset_split=_split_case(_split_bucket(split_key, seed), train_ratio, val_ratio))
+        )
+
+    await db.execute(stmt.execution_options(synchronize_session=False))
+
+
+def _export_stem(image_id: uuid.UUID, filename: str) -> str:
+    """Archive name of an image's files; the id keeps images with the same filename apart."""
+    return f"{Path(filename).stem}_{image_id}"
 
 
 async def generate_yolo_export(db: AsyncSession, project_id: uuid.UUID) -> io.BytesIO:
@@ -50,13 +142,17 @@ async def generate_yolo_export(db: AsyncSession, project_id: uuid.UUID) -> io.By
     images = list(images_result.scalars().all())
 
     # Build zip in memory
+    storage = get_storage()
     zip_buffer = io.BytesIO()
     with zipfile.ZipFile(zip_buffer, "w", zipfile.ZIP_DEFLATED) as zf:
         # Generate data.yaml
         class_names = {c.class_index: c.name for c in classes}
         yaml_content = "path: .\n"
         yaml_content += "train: images/train\n"
-        yaml_content += "val: images/val\n\n"
+        yaml_content += "val: images/val\n"
+        if any(img.dataset_split == "test" for img in images):
+            yaml_content += "test: images/test\n"
+        yaml_content += "\n"
         yaml_content += "names:\n"
         for idx in sorted(class_names.keys()):
             yaml_content += f"  {idx}: {class_names[idx]}\n"
@@ -64,13 +160,17 @@ async def generate_yolo_export(db: AsyncSession, project_id: uuid.UUID) -> io.By
 
         for img in images:
             split = img.dataset_split or "train"
-            stem = Path(img.filename).stem
+            stem = _export_stem(img.id, img.filename)
             ext = Path(img.filename).suffix or ".jpg"
 
             # Add image file
-            img_path = Path(img.storage_path)
-            if img_path.exists():
-                zf.write(str(img_path), f"images/{split}/{stem}{ext}")
+            arcname = f"images/{split}/{stem}{ext}"
+            img_path = storage.local_path(img.storage_path)
+            if img_path is not None:
+                if img_path.exists():
+                    zf.write(str(img_path), arcname)
+            elif await storage.exists(img.storage_path):
+                zf.writestr(arcname, await storage.read_bytes(img.storage_path))
 
             # Generate label file
             label_lines = []
@@ -92,3 +192,237 @@ async def generate_yolo_export(db: AsyncSession, project_id: uuid.UUID) -> io.By
 
     zip_buffer.seek(0)
     return zip_buffer
+
+
+# Rows fetched per round trip from the server-side cursors used by streaming exports
+EXPORT_STREAM_BATCH = 2000
+
+
+def _json(obj) -> str:
+    return json.dumps(obj, separators=(",", ":"))
+
+
+def _coco_annotation(ann_id: int, image_id: int, category_id: int, vertices: list, width: int, height: int) -> dict:
+    xs = [v["x"] * width for v in vertices]
+    ys = [v["y"] * height for v in vertices]
+    segmentation = []
+    for x, y in zip(xs, ys):
+        segmentation.append(round(x, 2))
+        segmentation.append(round(y, 2))
+
+    # Shoelace formula for the polygon area
+    area = 0.0
+    n = len(xs)
+    for i in range(n):
+        j = (i + 1) % n
+        area += xs[i] * ys[j] - xs[j] * ys[i]
+    area = abs(area) / 2.0
+
+    min_x, min_y = min(xs), min(ys)
+    return {
+        "id": ann_id,
+        "image_id": image_id,
+        "category_id": category_id,
+        "segmentation": [segmentation],
+        "area": round(area, 2),
+        "bbox": [round(min_x, 2), round(min_y, 2), round(max(xs) - min_x, 2), round(max(ys) - min_y, 2)],
+        "iscrowd": 0,
+    }
+
+
+async def generate_coco_export(
+    project_id: uuid.UUID, session_factory: Callable[[], AsyncSession] = async_session,
+) -> AsyncIterator[bytes]:
+    """Stream a COCO instance-segmentation JSON document for the project.
+
+    The images and annotations arrays are read through server-side cursors and
+    written out one batch at a time, so memory stays flat regardless of project
+    size. COCO ids are integers: images are numbered by their position in id
+    order and categories use ``class_index + 1`` (0 is left for background).
+    """
+    # The request-scoped session is closed before the response body is sent,
+    # so the stream owns its own session for the lifetime of the cursors.
+    async with session_factory() as db:
+        proj_result = await db.execute(select(Project).where(Project.id == project_id))
+        project = proj_result.scalar_one_or_none()
+        if not project:
+            raise ValueError("Project not found")
+
+        classes_result = await db.execute(
+            select(ProjectClass)
+            .where(ProjectClass.project_id == project_id)
+            .order_by(ProjectClass.class_index)
+        )
+        classes = list(classes_result.scalars().all())
+        category_map = {c.id: c.class_index + 1 for c in classes}
+        categories = [
+            {"id": c.class_index + 1, "name": c.name, "supercategory": "none"}
+            for c in classes
+        ]
+
+        info = {
+            "description": project.name,
+            "version": "1.0",
+            "date_created": datetime.now(timezone.utc).isoformat(),
+        }
+        yield (
+            f'{{"info":{_json(info)},"licenses":[],'
+            f'"categories":{_json(categories)},"images":['
+        ).encode()
+
+        image_rank = func.row_number().over(order_by=Image.id)
+
+        images_stream = await db.stream(
+            select(
+                image_rank.label("coco_id"),
+                Image.filename,
+                Image.width,
+                Image.height,
+                Image.dataset_split,
+            )
+            .where(Image.project_id == project_id)
+            .order_by(Image.id)
+            .execution_options(yield_per=EXPORT_STREAM_BATCH)
+        )
+        sep = ""
+        async for rows in images_stream.partitions():
+            parts = []
+            for row in rows:
+                parts.append(_json({
+                    "id": row.coco_id,
+                    "file_name": row.filename,
+                    "width": row.width,
+                    "height": row.height,
+                    "split": row.dataset_split or "train",
+                }))
+            yield (sep + ",".join(parts)).encode()
+            sep = ","
+
+        yield b'],"annotations":['
+
+        ranked_images = (
+            select(
+                Image.id,
+                Image.width,
+                Image.height,
+                image_rank.label("coco_id"),
+            )
+            .where(Image.project_id == project_id)
+            .subquery()
+        )
+        annotations_stream = await db.stream(
+            select(
+                ranked_images.c.coco_id,
+                ranked_images.c.width,
+                ranked_images.c.height,
+                Annotation.class_id,
+                Annotation.vertices,
+            )
+            .join(ranked_images, Annotation.image_id == ranked_images.c.id)
+            .execution_options(yield_per=EXPORT_STREAM_BATCH)
+        )
+        sep = ""
+        ann_id = 0
+        async for rows in annotations_stream.partitions():
+            parts = []
+            for row in rows:
+                category_id = category_map.get(row.class_id)
+                if category_id is None or not row.vertices:
+                    continue
+                ann_id += 1
+                parts.append(_json(_coco_annotation(
+                    ann_id, row.coco_id, category_id, row.vertices, row.width, row.height,
+                )))
+            if parts:
+                yield (sep + ",".join(parts)).encode()
+                sep = ","
+
+        yield b"]}"
+
+
+# Images rasterized per process-pool task; large enough to amortize pickling overhead
+MASK_TASK_SIZE = 16
+
+
+async def generate_mask_export(
+    project_id: uuid.UUID, session_factory: Callable[[], AsyncSession] = async_session,
+) -> AsyncIterator[bytes]:
+    """Stream a zip of per-image class-index PNG masks for semantic segmentation.
+
+    Pixel values are ``class_index + 1`` with 0 as background, at each image's
+    native size. Masks are laid out as ``masks/<split>/<stem>_<image id>.png`` so
+    they pair with the images and labels of the YOLO export. Rasterization runs
+    in the process pool with a bounded number of batches in flight, and entries
+    are emitted in image order as soon as they are ready.
+    """
+    async with session_factory() as db:
+        classes_result = await db.execute(
+            select(ProjectClass)
+            .where(ProjectClass.project_id == project_id)
+            .order_by(ProjectClass.class_index)
+        )
+        classes = list(classes_result.scalars().all())
+        value_map = {c.id: c.class_index + 1 for c in classes}
+        mode = "L" if max(value_map.values(), default=0) <= 255 else "I"
+
+        archive = ZipStream()
+        labelmap = "0 background\n" + "".join(f"{c.class_index + 1} {c.name}\n" for c in classes)
+        yield archive.writestr("labelmap.txt", labelmap)
+
+        pending: deque[tuple[list[str], asyncio.Future]] = deque()
+        max_in_flight = process_pool_size() * 2
+        last_id = None
+
+        while True:
+            page_query = (
+                select(Image.id, Image.filename, Image.width, Image.height, Image.dataset_split)
+                .where(Image.project_id == project_id)
+                .order_by(Image.id)
+                .limit(MASK_TASK_SIZE * 8)
+            )
+            if last_id is not None:
+                page_query = page_query.where(Image.id > last_id)
+            images = (await db.execute(page_query)).all()
+            if not images:
+                break
+            last_id = images[-1].id
+
+            ann_result = await db.execute(
+                select(Annotation.image_id, Annotation.class_id, Annotation.vertices)
+                .where(Annotation.image_id.in_([img.id for img in images]))
+                .order_by(Annotation.created_at)
+            )
+            polygons = defaultdict(list)
+            sizes = {img.id: (img.width, img.height) for img in images}
+            for image_id, class_id, vertices in ann_result.all():
+                value = value_map.get(class_id)
+                if value is None:
+                    continue
+                width, height = sizes[image_id]
+                points = []
+                for v in vertices:
+                    points.append(v["x"] * width)
+                    points.append(v["y"] * height)
+                polygons[image_id].append((value, points))
+
+            for start in range(0, len(images), MASK_TASK_SIZE):
+                batch = images[start:start + MASK_TASK_SIZE]
+                names = [
+                    f"masks/{img.dataset_split or 'train'}/{_export_stem(img.id, img.filename)}.png"
+                    for img in batch
+                ]
+                jobs = [(img.width, img.height, polygons.get(img.id, [])) for img in batch]
+                pending.append((names, run_in_process(rasterize_masks, mode, jobs)))
+
+                while len(pending) >= max_in_flight:
+                    names, future = pending.popleft()
+                    for name, png in zip(names, await future):
+                        # PNG is already deflated; storing avoids compressing it twice
+                        yield archive.writestr(name, png, compress_type=zipfile.ZIP_STORED)
+
+        while pending:
+            names, future = pending.popleft()
+            for name, png in zip(names, await future):
+                yield archive.writestr(name, png, compress_type=zipfile.ZIP_STORED)
+
+        yield archive.close()
@@ -1,48 +1,191 @@
-import os
+import hashlib
 import uuid
+from datetime import datetime
 from pathlib import Path
 
 from PIL import Image as PILImage
 from fastapi import UploadFile
+from sqlalchemy import select, update, delete, func, tuple_
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.config import settings
+from app.models.image import Image, ImageAssignment, ImageBlob
+from app.monitoring.metrics import UPLOAD_BYTES
+from app.services.process_pool import run_in_process
+from app.services.similarity_service import dhash
+from app.services.storage import get_storage
 
+UPLOAD_CHUNK_SIZE = 1024 * 1024
+# Scratch directory under UPLOAD_DIR where uploads are spooled and processed before being stored
+INCOMING_DIR = ".incoming"
 
-async def save_uploaded_image(file: UploadFile, project_id: uuid.UUID) -> dict:
-    upload_dir = Path(settings.UPLOAD_DIR) / str(project_id)
-    upload_dir.mkdir(parents=True, exist_ok=True)
 
-    thumb_dir = upload_dir / "thumbnails"
-    thumb_dir.mkdir(exist_ok=True)
+def _fan_out(name: str) -> str:
+    """Spread files over 65536 directories by the first four hex digits of their uuid name."""
+    return f"{name[:2]}/{name[2:4]}/{name}"
 
-    file_id = uuid.uuid4()
-    ext = Path(file.filename).suffix.lower() or ".jpg"
-    storage_name = f"{file_id}{ext}"
-    storage_path = upload_dir / storage_name
-    thumb_path = thumb_dir / f"{file_id}_thumb.jpg"
 
-    content = await file.read()
-    with open(storage_path, "wb") as f:
-        f.write(content)
+def original_key(project_id, name: str) -> str:
+    return f"{project_id}/{_fan_out(name)}"
 
-    img = PILImage.open(storage_path)
-    width, height = img.size
 
-    # Generate thumbnail
-    thumb_size = (300, 300)
-    img_copy = img.copy()
-    img_copy.thumbnail(thumb_size)
-    if img_copy.mode in ("RGBA", "P"):
-        img_copy = img_copy.convert("RGB")
-    img_copy.save(thumb_path, "JPEG", quality=85)
-    img.close()
-    img_copy.close()
+def thumbnail_key(project_id, name: str) -> str:
+    return f"{project_id}/thumbnails/{_fan_out(name)}"
 
+
+async def _spool_upload(file: UploadFile, directory: Path) -> tuple[Path, str, int]:
+    """Copy an upload to a temporary file in chunks, hashing it on the way through."""
+    digest = hashlib.sha256()
+    size = 0
+    tmp_path = directory / f".upload-{uuid.uuid4()}"
+    with open(tmp_path, "wb") as f:
+        while chunk := await file.read(UPLOAD_CHUNK_SIZE):
+            digest.update(chunk)
+            f.write(chunk)
+            size += len(chunk)
+            UPLOAD_BYTES.inc(len(chunk))
+    return tmp_path, digest.hexdigest(), size
+
+
+def _inspect_image(storage_path: Path) -> tuple[int, int, int]:
+    """Read dimensions and compute the perceptual hash. Runs in the process pool.
+
+    Thumbnails are rendered on demand by the thumbnail service.
+    """
+    with PILImage.open(storage_path) as img:
+        width, height = img.size
+        return width, height, dhash(img)
+
+
+def image_list_query(project_id: uuid.UUID, assignee_id: uuid.UUID | None = None):
+    """A project's images in list order, newest first; only those assigned to ``assignee_id`` if given."""
+    query = select(Image).where(Image.project_id == project_id)
+    if assignee_id is not None:
+        query = query.join(ImageAssignment, ImageAssignment.image_id == Image.id).where(
+            ImageAssignment.user_id == assignee_id
+        )
+    # Files of one upload share uploaded_at, so id keeps the order total
+    return query.order_by(Image.uploaded_at.desc(), Image.id.desc())
+
+
+def images_after(query, uploaded_at: datetime, image_id: uuid.UUID):
+    """Continue an image_list_query past the given image."""
+    return query.where(tuple_(Image.uploaded_at, Image.id) < tuple_(uploaded_at, image_id))
+
+
+def _blob_info(filename: str, blob) -> dict:
     return {
-        "filename": file.filename,
-        "storage_path": str(storage_path),
-        "thumbnail_path": str(thumb_path),
-        "width": width,
-        "height": height,
-        "file_size": len(content),
+        "filename": filename,
+        "storage_path": blob.storage_path,
+        "thumbnail_path": blob.thumbnail_path,
+        "width": blob.width,
+        "height": blob.height,
+        "file_size": blob.file_size,
+        "content_hash": blob.content_hash,
+        "phash": blob.phash,
     }
+
+
+async def save_uploaded_image(db: AsyncSession, file: UploadFile, project_id: uuid.UUID) -> dict:
+    """Store an upload, sharing the physical file between images with identical content.
+
+    Returns the column values for a new Image, or ``{"duplicate_of": image}``
+    when the project already holds an image with the same SHA-256.
+    """
+    scratch_dir = Path(settings.UPLOAD_DIR) / INCOMING_DIR
+    scratch_dir.mkdir(parents=True, exist_ok=True)
+
+    tmp_path, content_hash, size = await _spool_upload(file, scratch_dir)
+    try:
+        existing = await db.execute(
+            select(Image).where(Image.project_id == project_id, Image.content_hash == content_hash)
+        )
+        duplicate = existing.scalar_one_or_none()
+        if duplicate:
+            return {"duplicate_of": duplicate}
+
+        # Same content already stored for another project: take a reference to it
+        linked = await db.execute(
+            update(ImageBlob)
+            .where(ImageBlob.content_hash == content_hash)
+            .values(ref_count=ImageBlob.ref_count + 1)
+            .returning(ImageBlob)
+        )
+        blob = linked.scalar_one_or_none()
+        if blob:
+            return _blob_info(file.filename, blob)
+
+        file_id = uuid.uuid4()
+        ext = Path(file.filename).suffix.lower() or ".jpg"
+        storage_key = original_key(project_id, f"{file_id}{ext}")
+
+        width, height, phash = await run_in_process(_inspect_image, tmp_path)
+        storage = get_storage()
+        await storage.put_file(storage_key, tmp_path, file.content_type)
+
+        # A concurrent upload of the same content may have created the blob meanwhile
+        result = await db.execute(
+            insert(ImageBlob)
+            .values(
+                content_hash=content_hash,
+                storage_path=storage_key,
+                width=width,
+                height=height,
+                file_size=size,
+                phash=phash,
+                ref_count=1,
+            )
+            .on_conflict_do_update(
+                index_elements=[ImageBlob.content_hash],
+                set_={"ref_count": ImageBlob.ref_count + 1},
+            )
+            .returning(ImageBlob)
+        )
+        blob = result.scalar_one()
+        if blob.storage_path != storage_key:
+            await storage.delete(storage_key)
+
+        return _blob_info(file.filename, blob)
+    finally:
+        tmp_path.unlink(missing_ok=True)
+
+
+async def release_image_files(db: AsyncSession, image: Image) -> list[str]:
+    """Drop an already-deleted image's reference to its stored files.
+
+    Returns the storage keys that are no longer referenced by any image, for the deletion outbox.
+    """
+    if image.content_hash is None:
+        return [p for p in (image.storage_path, image.thumbnail_path) if p]
+
+    result = await db.execute(
+        update(ImageBlob)
+        .where(ImageBlob.content_hash == image.content_hash)
+        .values(ref_count=ImageBlob.ref_count - 1)
+        .returning(ImageBlob.ref_count, ImageBlob.storage_path, ImageBlob.thumbnail_path)
+    )
+    row = result.one_or_none()
+    if row is None or row.ref_count > 0:
+        return []
+
+    await db.execute(
+        delete(ImageBlob).where(ImageBlob.content_hash == image.content_hash, ImageBlob.ref_count <= 0)
+    )
+    return [p for p in (row.storage_path, row.thumbnail_path) if p]
+
+
+async def release_project_blobs(db: AsyncSession, project_id: uuid.UUID):
+    """Drop the blob references held by every image of a project that is about to be deleted."""
+    per_blob = (
+        select(Image.content_hash, func.count().label("refs"))
+        .where(Image.project_id == project_id, Image.content_hash.is_not(None))
+        .group_by(Image.content_hash)
+        .subquery()
+    )
+    await db.execute(
+        update(ImageBlob)
+        .where(ImageBlob.content_hash == per_blob.c.content_hash)
+        .values(ref_count=ImageBlob.ref_count - per_blob.c.refs)
+        .execution_options(synchronize_session=False)
+    )
@@ -0,0 +1,167 @@
+"""Bulk annotation import from NDJSON, for loading model pre-annotations.
+
+Each line is {"image_id": ..., "annotations": [{"class_id": ..., "vertices": [...]}]}
+and replaces that image's annotations, as PUT .../annotations does; a later
+line for the same image replaces an earlier one. Lines are parsed as the body
+arrives and written in chunks: one query checks the chunk's images belong to
+the project, one DELETE clears their annotations and a COPY writes the new
+ones. Lines that fail validation are reported and skipped; the rest of the
+import goes ahead, all in the caller's transaction.
+"""
+import uuid
+from collections.abc import AsyncIterator
+
+from pydantic import ValidationError
+from pydantic_core import to_json
+from sqlalchemy import delete, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.models.annotation import Annotation
+from app.models.image import Image
+from app.models.project import ProjectClass
+from app.schemas.annotation import AnnotationImportResponse, AnnotationImportResult, annotation_import_line
+
+# Rows written per COPY; an image without annotations counts as one. Also bounds
+# the image ids checked per query well below asyncpg's 32767 parameter limit.
+CHUNK_ROWS = 10000
+MAX_LINE_BYTES = 16 * 1024 * 1024
+
+# id comes from the column default
+_COLUMNS = ("image_id", "class_id", "vertices", "created_by")
+
+
+class ImportLineTooLong(Exception):
+    pass
+
+
+async def _lines(chunks: AsyncIterator[bytes]) -> AsyncIterator[bytes]:
+    buffer = bytearray()
+    async for chunk in chunks:
+        buffer += chunk
+        if b"\n" in chunk:
+            *lines, rest = buffer.split(b"\n")
+            for line in lines:
+                yield line
+            buffer = bytearray(rest)
+        if len(buffer) > MAX_LINE_BYTES:
+            raise ImportLineTooLong(f"Line longer than {MAX_LINE_BYTES} bytes")
+    if buffer:
+        yield bytes(buffer)
+
+
+def _describe(exc: ValidationError) -> str:
+    error = exc.errors(include_url=False)[0]
+    location = ".".join(str(part) for part in error["loc"])
+    return f"{location}: {error['msg']}" if location else error["msg"]
+
+
+class _Chunk:
+    def __init__(self):
+        # image id -> (line number, rows)
+        self.images: dict[uuid.UUID, tuple[int, list[tuple]]] = {}
+        self.size = 0
+
+    def add(self, line_no: int, image_id: uuid.UUID, rows: list[tuple]) -> int | None:
+        """Queue an image's rows. Returns the line number of the entry it replaces, if any."""
+        replaced = self.images.pop(image_id, None)
+        if replaced is not None:
+            self.size -= max(1, len(replaced[1]))
+        self.images[image_id] = (line_no, rows)
+        self.size += max(1, len(rows))
+        return replaced[0] if replaced else None
+
+
+async def _write_chunk(
+    db: AsyncSession,
+    project_id: uuid.UUID,
+    chunk: _Chunk,
+    results: list[AnnotationImportResult],
+    written: dict[uuid.UUID, int],
+):
+    """Write a chunk. ``written`` maps each image already written to the index of its result."""
+    result = await db.execute(
+        select(Image.id).where(Image.project_id == project_id, Image.id.in_(list(chunk.images)))
+    )
+    found = set(result.scalars())
+
+    rows = []
+    for image_id, (line_no, image_rows) in chunk.images.items():
+        if image_id not in found:
+            results.append(AnnotationImportResult(line=line_no, image_id=image_id, error="Image not found in project"))
+            continue
+        rows += image_rows
+        earlier = written.get(image_id)
+        if earlier is not None:
+            # Written by an earlier chunk; this chunk's DELETE replaces it
+            results[earlier] = AnnotationImportResult(
+                line=results[earlier].line, image_id=image_id, error=f"Replaced by line {line_no}",
+            )
+        written[image_id] = len(results)
+        results.append(AnnotationImportResult(line=line_no, image_id=image_id, annotations=len(image_rows)))
+
+    if found:
+        await db.execute(
+            delete(Annotation)
+            .where(Annotation.image_id.in_(list(found)))
+            .execution_options(synchronize_session=False)
+        )
+    if rows:
+        # COPY on the session's own connection, so it runs in the same transaction
+        connection = await (await db.connection()).get_raw_connection()
+        await connection.driver_connection.copy_records_to_table(
+            Annotation.__tablename__, records=rows, columns=_COLUMNS,
+        )
+
+
+async def import_annotations(
+    db: AsyncSession, project_id: uuid.UUID, user_id: uuid.UUID, body: AsyncIterator[bytes],
+) -> AnnotationImportResponse:
+    result = await db.execute(select(ProjectClass.id).where(ProjectClass.project_id == project_id))
+    class_ids = set(result.scalars())
+
+    results: list[AnnotationImportResult] = []
+    written: dict[uuid.UUID, int] = {}
+    chunk = _Chunk()
+    line_no = 0
+    async for line in _lines(body):
+        line_no += 1
+        if not line.strip():
+            continue
+        try:
+            item = annotation_import_line.validate_json(line)
+        except ValidationError as exc:
+            results.append(AnnotationImportResult(line=line_no, error=_describe(exc)))
+            continue
+
+        image_id = item["image_id"]
+        unknown = {ann["class_id"] for ann in item["annotations"]} - class_ids
+        if unknown:
+            results.append(AnnotationImportResult(
+                line=line_no, image_id=image_id, error=f"Unknown class id {sorted(map(str, unknown))[0]}",
+            ))
+            continue
+
+        rows = [
+            (image_id, ann["class_id"], to_json(ann["vertices"]).decode(), user_id)
+            for ann in item["annotations"]
+        ]
+        replaced = chunk.add(line_no, image_id, rows)
+        if replaced is not None:
+            results.append(AnnotationImportResult(
+                line=replaced, image_id=image_id, error=f"Replaced by line {line_no}",
+            ))
+        if chunk.size >= CHUNK_ROWS:
+            await _write_chunk(db, project_id, chunk, results, written)
+            chunk = _Chunk()
+
+    if chunk.images:
+        await _write_chunk(db, project_id, chunk, results, written)
+
+    results.sort(key=lambda r: r.line)
+    imported = [r for r in results if r.error is None]
+    return AnnotationImportResponse(
+        images=len(imported),
+        annotations=sum(r.annotations for r in imported),
+        failed=len(results) - len(imported),
+        results=results,
+    )
@@ -0,0 +1,174 @@
+"""Relocate files from the flat per-project layout to the sharded one.
+
+Files stored before sharding sit directly in ``<project_id>/`` and
+``<project_id>/thumbnails/``. This moves them under the two-level hex
+fan-out used for new uploads, a batch at a time: files are copied (hard
+linked on local disk), the batch's rows are updated and committed, and only
+then are the old files removed, so a crash never leaves a row pointing at a
+missing file. Run it once with ``python -m app.services.layout_migration``
+or in the background of a worker with MIGRATE_UPLOAD_LAYOUT=true.
+"""
+import asyncio
+import logging
+from pathlib import PurePath
+
+from sqlalchemy import select, text, update
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.database import async_session, engine
+from app.models.image import Image, ImageBlob
+from app.services.image_service import original_key, thumbnail_key
+from app.services.storage import get_storage
+
+logger = logging.getLogger(__name__)
+
+LAYOUT_MIGRATION_BATCH = 500
+# pg_try_advisory_lock key so only one worker migrates at a time
+LAYOUT_MIGRATION_LOCK = 0x616E6F01
+
+
+def sharded_key(key: str | None) -> str | None:
+    """New key for a file in the flat layout, or None if it is already sharded (or absent)."""
+    if not key:
+        return None
+    parts = PurePath(key).parts
+    if len(parts) < 2:
+        return None
+    name = parts[-1]
+    if len(parts) >= 3 and parts[-3] == name[:2] and parts[-2] == name[2:4]:
+        return None
+    if parts[-2] == "thumbnails":
+        if len(parts) < 3:
+            return None
+        return thumbnail_key(parts[-3], name)
+    return original_key(parts[-2], name)
+
+
+async def _relocate(moves: list[tuple[str, str]]) -> list[tuple[str, str]]:
+    """Copy each file to its new key, returning the moves whose source existed."""
+    storage = get_storage()
+    done = []
+    for old, new in moves:
+        if await storage.exists(old):
+            await storage.copy(old, new)
+            done.append((old, new))
+        else:
+            logger.warning("layout migration: %s is missing, leaving its row unchanged", old)
+    return done
+
+
+async def _migrate_blob_batch(db: AsyncSession, after: str | None) -> tuple[str | None, int]:
+    query = select(ImageBlob).order_by(ImageBlob.content_hash).limit(LAYOUT_MIGRATION_BATCH)
+    if after is not None:
+        query = query.where(ImageBlob.content_hash > after)
+    blobs = (await db.execute(query)).scalars().all()
+    if not blobs:
+        return None, 0
+
+    moves, rows = [], []
+    for blob in blobs:
+        new_storage, new_thumb = sharded_key(blob.storage_path), sharded_key(blob.thumbnail_path)
+        if new_storage is None and new_thumb is None:
+            continue
+        moved = dict(await _relocate([
+            (old, new) for old, new in ((blob.storage_path, new_storage), (blob.thumbnail_path, new_thumb)) if new
+        ]))
+        if not moved:
+            continue
+        rows.append({
+            "content_hash": blob.content_hash,
+            "storage_path": moved.get(blob.storage_path, blob.storage_path),
+            "thumbnail_path": moved.get(blob.thumbnail_path, blob.thumbnail_path),
+        })
+        moves.extend(moved.items())
+
+    if rows:
+        await db.execute(update(ImageBlob), rows)
+        # Images copy their blob's paths; bring every referencing row along
+        await db.execute(
+            update(Image)
+            .where(
+                Image.content_hash == ImageBlob.content_hash,
+                ImageBlob.content_hash.in_([row["content_hash"] for row in rows]),
+            )
+            .values(storage_path=ImageBlob.storage_path, thumbnail_path=ImageBlob.thumbnail_path)
+            .execution_options(synchronize_session=False)
+        )
+    await db.commit()
+
+    storage = get_storage()
+    for old, _new in moves:
+        await storage.delete(old)
+    return blobs[-1].content_hash, len(rows)
+
+
+async def _migrate_legacy_image_batch(db: AsyncSession, after) -> tuple[object, int]:
+    """Images uploaded before content hashing own their files outright."""
+    query = (
+        select(Image.id, Image.storage_path, Image.thumbnail_path)
+        .where(Image.content_hash.is_(None))
+        .order_by(Image.id)
+        .limit(LAYOUT_MIGRATION_BATCH)
+    )
+    if after is not None:
+        query = query.where(Image.id > after)
+    images = (await db.execute(query)).all()
+    if not images:
+        return None, 0
+
+    moves, rows = [], []
+    for image in images:
+        new_storage, new_thumb = sharded_key(image.storage_path), sharded_key(image.thumbnail_path)
+        if new_storage is None and new_thumb is None:
+            continue
+        moved = dict(await _relocate([
+            (old, new) for old, new in ((image.storage_path, new_storage), (image.thumbnail_path, new_thumb)) if new
+        ]))
+        if not moved:
+            continue
+        rows.append({
+            "id": image.id,
+            "storage_path": moved.get(image.storage_path, image.storage_path),
+            "thumbnail_path": moved.get(image.thumbnail_path, image.thumbnail_path),
+        })
+        moves.extend(moved.items())
+
+    if rows:
+        await db.execute(update(Image), rows)
+    await db.commit()
+
+    storage = get_storage()
+    for old, _new in moves:
+        await storage.delete(old)
+    return images[-1].id, len(rows)
+
+
+async def migrate_upload_layout() -> int:
+    """Move every flat-layout file into the sharded layout. Returns the number of rows relocated."""
+    async with engine.connect() as lock_conn:
+        locked = (await lock_conn.execute(
+            text("SELECT pg_try_advisory_lock(:key)"), {"key": LAYOUT_MIGRATION_LOCK}
+        )).scalar()
+        if not locked:
+            logger.info("layout migration already running elsewhere")
+            return 0
+        try:
+            total = 0
+            for migrate_batch in (_migrate_blob_batch, _migrate_legacy_image_batch):
+                cursor = None
+                while True:
+                    async with async_session() as db:
+                        cursor, moved = await migrate_batch(db, cursor)
+                    if cursor is None:
+                        break
+                    total += moved
+                    if moved:
+                        logger.info("layout migration: %d rows relocated", total)
+            return total
+        finally:
+            await lock_conn.execute(text("SELECT pg_advisory_unlock(:key)"), {"key": LAYOUT_MIGRATION_LOCK})
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    print(f"relocated {asyncio.run(migrate_upload_layout())} rows")
@@ -0,0 +1,24 @@
+import io
+
+from PIL import Image as PILImage, ImageDraw
+
+
+def rasterize_masks(mode: str, jobs: list[tuple[int, int, list[tuple[int, list[float]]]]]) -> list[bytes]:
+    """Rasterize class-index masks for a batch of images and return them as PNG bytes.
+
+    Each job is ``(width, height, polygons)`` where polygons are ``(value, [x0, y0, x1, y1, ...])``
+    in pixel coordinates, drawn in order so later annotations win on overlap. Runs in
+    the process pool; Pillow's polygon fill is a C scanline rasterizer.
+    """
+    results = []
+    for width, height, polygons in jobs:
+        mask = PILImage.new(mode, (width, height), 0)
+        draw = ImageDraw.Draw(mask)
+        for value, points in polygons:
+            if len(points) >= 6:
+                draw.polygon(points, fill=value)
+        buffer = io.BytesIO()
+        mask.save(buffer, "PNG", compress_level=3)
+        mask.close()
+        results.append(buffer.getvalue())
+    return results
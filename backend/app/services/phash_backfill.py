@@ -0,0 +1,142 @@
+"""Give images stored before near-duplicate detection a perceptual hash and a cluster.
+
+Images uploaded earlier have no phash, so near-duplicate search, the cluster
+listing and cluster-aware splits cannot see them. This fills phash in from the
+shared blob where one already has it and otherwise hashes the stored file in
+the process pool, then places every hashed image without a cluster the way an
+upload would. Work is committed a batch at a time, so it can be interrupted
+and rerun. Run it once with ``python -m app.services.phash_backfill`` or in
+the background of a worker with BACKFILL_PHASH=true.
+"""
+import asyncio
+import logging
+import tempfile
+import uuid
+from pathlib import Path
+
+from PIL import Image as PILImage
+from sqlalchemy import select, text, update
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.database import async_session, engine
+from app.models.image import Image, ImageBlob
+from app.services.process_pool import run_in_process
+from app.services.similarity_service import assign_phash_cluster, dhash
+from app.services.storage import get_storage
+
+logger = logging.getLogger(__name__)
+
+PHASH_BACKFILL_BATCH = 200
+# pg_try_advisory_lock key so only one worker backfills at a time
+PHASH_BACKFILL_LOCK = 0x616E6F03
+
+
+def _file_phash(path: Path) -> int:
+    """Runs in the process pool."""
+    with PILImage.open(path) as img:
+        return dhash(img)
+
+
+async def _stored_phash(key: str) -> int | None:
+    storage = get_storage()
+    try:
+        if not await storage.exists(key):
+            logger.warning("phash backfill: %s is missing, leaving its image unhashed", key)
+            return None
+        path = storage.local_path(key)
+        if path is not None:
+            return await run_in_process(_file_phash, path)
+        with tempfile.TemporaryDirectory() as tmp:
+            dest = Path(tmp) / "image"
+            await storage.download_to(key, dest)
+            return await run_in_process(_file_phash, dest)
+    except Exception:
+        logger.warning("phash backfill: cannot hash %s", key, exc_info=True)
+        return None
+
+
+async def _hash_batch(db: AsyncSession, after: uuid.UUID | None) -> tuple[uuid.UUID | None, int]:
+    query = select(Image.id, Image.storage_path, Image.content_hash).where(Image.phash.is_(None))
+    if after is not None:
+        query = query.where(Image.id > after)
+    rows = (await db.execute(query.order_by(Image.id).limit(PHASH_BACKFILL_BATCH))).all()
+    if not rows:
+        return None, 0
+
+    hashes = await asyncio.gather(*(_stored_phash(row.storage_path) for row in rows))
+    updates = [{"id": row.id, "phash": phash} for row, phash in zip(rows, hashes) if phash is not None]
+    if updates:
+        await db.execute(update(Image), updates)
+        blob_updates = {
+            row.content_hash: phash for row, phash in zip(rows, hashes) if phash is not None and row.content_hash
+        }
+        for content_hash, phash in blob_updates.items():
+            await db.execute(
+                update(ImageBlob)
+                .where(ImageBlob.content_hash == content_hash, ImageBlob.phash.is_(None))
+                .values(phash=phash)
+            )
+    await db.commit()
+    return rows[-1].id, len(updates)
+
+
+async def _cluster_batch(db: AsyncSession, after: uuid.UUID | None) -> tuple[uuid.UUID | None, int]:
+    query = select(Image).where(Image.phash.is_not(None), Image.phash_cluster.is_(None))
+    if after is not None:
+        query = query.where(Image.id > after)
+    images = (await db.execute(query.order_by(Image.id).limit(PHASH_BACKFILL_BATCH))).scalars().all()
+    if not images:
+        return None, 0
+
+    for image in images:
+        # An earlier image of the batch may have pulled this one into its cluster already
+        await db.refresh(image, ["phash_cluster"])
+        if image.phash_cluster is None:
+            await assign_phash_cluster(db, image)
+    await db.commit()
+    return images[-1].id, len(images)
+
+
+async def backfill_phashes() -> int:
+    """Hash and cluster every image that predates near-duplicate detection. Returns the number hashed."""
+    async with engine.connect() as lock_conn:
+        locked = (await lock_conn.execute(
+            text("SELECT pg_try_advisory_lock(:key)"), {"key": PHASH_BACKFILL_LOCK}
+        )).scalar()
+        if not locked:
+            logger.info("phash backfill already running elsewhere")
+            return 0
+        try:
+            async with async_session() as db:
+                # Images sharing a blob that already has a hash need no file read
+                await db.execute(
+                    update(Image)
+                    .where(
+                        Image.phash.is_(None),
+                        Image.content_hash == ImageBlob.content_hash,
+                        ImageBlob.phash.is_not(None),
+                    )
+                    .values(phash=ImageBlob.phash)
+                    .execution_options(synchronize_session=False)
+                )
+                await db.commit()
+
+            hashed = 0
+            for backfill_batch in (_hash_batch, _cluster_batch):
+                cursor = None
+                while True:
+                    async with async_session() as db:
+                        cursor, done = await backfill_batch(db, cursor)
+                    if cursor is None:
+                        break
+                    if backfill_batch is _hash_batch:
+                        hashed += done
+                        logger.info("phash backfill: %d images hashed", hashed)
+            return hashed
+        finally:
+            await lock_conn.execute(text("SELECT pg_advisory_unlock(:key)"), {"key": PHASH_BACKFILL_LOCK})
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    print(f"hashed {asyncio.run(backfill_phashes())} images")
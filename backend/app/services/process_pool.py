@@ -0,0 +1,35 @@
+import asyncio
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+
+from app.config import settings
+
+_pool: ProcessPoolExecutor | None = None
+
+
+def get_process_pool() -> ProcessPoolExecutor:
+    """Return the shared pool used for CPU-bound image work, creating it on first use."""
+    global _pool
+    if _pool is None:
+        # spawn rather than fork: the parent runs an event loop and DB connection threads
+        _pool = ProcessPoolExecutor(
+            max_workers=settings.PROCESS_POOL_WORKERS or None,
+            mp_context=multiprocessing.get_context("spawn"),
+        )
+    return _pool
+
+
+def process_pool_size() -> int:
+    return get_process_pool()._max_workers
+
+
+def run_in_process(fn, *args) -> asyncio.Future:
+    """Submit fn(*args) to the shared process pool; the work starts immediately."""
+    return asyncio.get_running_loop().run_in_executor(get_process_pool(), fn, *args)
+
+
+def shutdown_process_pool():
+    global _pool
+    if _pool is not None:
+        _pool.shutdown(wait=False, cancel_futures=True)
+        _pool = None
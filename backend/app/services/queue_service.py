@@ -0,0 +1,125 @@
+"""Pull-based work queue: annotators claim the next unannotated image with a lease.
+
+A claim is an ImageAssignment whose lease_expires_at is set. Queue candidates
+are images in the project with no annotations and no assignment, except claims
+whose lease has run out. The candidate row is taken with FOR UPDATE SKIP
+LOCKED, so concurrent claimers each skip past rows another transaction is
+claiming instead of queueing behind its lock. Admin-made assignments (no lease)
+are never handed out by the queue.
+"""
+import uuid
+from datetime import datetime, timedelta
+
+from sqlalchemy import delete, exists, func, or_, select, update
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.config import settings
+from app.models.annotation import Annotation
+from app.models.image import Image, ImageAssignment
+
+# A claim can lose a race with a claim that committed between its snapshot and its row lock
+CLAIM_ATTEMPTS = 5
+
+
+def _lease_expiry():
+    return func.now() + timedelta(seconds=settings.QUEUE_LEASE_SECONDS)
+
+
+def _unannotated():
+    return ~exists().where(Annotation.image_id == Image.id)
+
+
+def _in_project(project_id: uuid.UUID):
+    return ImageAssignment.image_id.in_(select(Image.id).where(Image.project_id == project_id))
+
+
+async def current_claim(db: AsyncSession, project_id: uuid.UUID, user_id: uuid.UUID) -> tuple[uuid.UUID, datetime] | None:
+    """Renew and return the user's live claim in the project that is still unannotated, if any."""
+    result = await db.execute(
+        update(ImageAssignment)
+        .where(
+            ImageAssignment.user_id == user_id,
+            ImageAssignment.lease_expires_at > func.now(),
+            _in_project(project_id),
+            ~exists().where(Annotation.image_id == ImageAssignment.image_id),
+        )
+        .values(lease_expires_at=_lease_expiry())
+        .execution_options(synchronize_session=False)
+        .returning(ImageAssignment.image_id, ImageAssignment.lease_expires_at)
+    )
+    row = result.first()
+    return (row.image_id, row.lease_expires_at) if row else None
+
+
+async def claim_next_image(db: AsyncSession, project_id: uuid.UUID, user_id: uuid.UUID) -> tuple[uuid.UUID, datetime] | None:
+    """Claim the oldest unclaimed, unannotated image. Returns None when there is nothing left."""
+    candidate = (
+        select(Image.id)
+        .where(
+            Image.project_id == project_id,
+            _unannotated(),
+            ~exists().where(
+                ImageAssignment.image_id == Image.id,
+                or_(ImageAssignment.lease_expires_at.is_(None), ImageAssignment.lease_expires_at > func.now()),
+            ),
+        )
+        .order_by(Image.uploaded_at, Image.id)
+        .limit(1)
+        .with_for_update(of=Image, skip_locked=True)
+    )
+    for _ in range(CLAIM_ATTEMPTS):
+        image_id = (await db.execute(candidate)).scalar_one_or_none()
+        if image_id is None:
+            return None
+
+        stmt = insert(ImageAssignment).values(image_id=image_id, user_id=user_id, lease_expires_at=_lease_expiry())
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[ImageAssignment.image_id],
+            set_={
+                "user_id": stmt.excluded.user_id,
+                "assigned_at": func.now(),
+                "lease_expires_at": stmt.excluded.lease_expires_at,
+            },
+            # Only take over claims that have run out, never live ones or admin assignments
+            where=ImageAssignment.lease_expires_at <= func.now(),
+        ).returning(ImageAssignment.lease_expires_at)
+        expires = (await db.execute(stmt)).scalar_one_or_none()
+        if expires is not None:
+            return image_id, expires
+    return None
+
+
+async def renew_claim(
+    db: AsyncSession, project_id: uuid.UUID, image_id: uuid.UUID, user_id: uuid.UUID,
+) -> datetime | None:
+    """Extend the user's claim on an image. None if the user does not hold one (any more)."""
+    result = await db.execute(
+        update(ImageAssignment)
+        .where(
+            ImageAssignment.image_id == image_id,
+            ImageAssignment.user_id == user_id,
+            ImageAssignment.lease_expires_at.is_not(None),
+            _in_project(project_id),
+        )
+        .values(lease_expires_at=_lease_expiry())
+        .execution_options(synchronize_session=False)
+        .returning(ImageAssignment.lease_expires_at)
+    )
+    return result.scalar_one_or_none()
+
+
+async def release_claim(db: AsyncSession, project_id: uuid.UUID, image_id: uuid.UUID, user_id: uuid.UUID) -> bool:
+    """Give a claimed image back to the queue."""
+    result = await db.execute(
+        delete(ImageAssignment)
+        .where(
+            ImageAssignment.image_id == image_id,
+            ImageAssignment.user_id == user_id,
+            ImageAssignment.lease_expires_at.is_not(None),
+            _in_project(project_id),
+        )
+        .execution_options(synchronize_session=False)
+        .returning(ImageAssignment.image_id)
+    )
+    return result.scalar_one_or_none() is not None
@@ -0,0 +1,124 @@
+import uuid
+from itertools import combinations
+
+from PIL import Image as PILImage
+from sqlalchemy import func, literal_column, or_, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.config import settings
+from app.models.image import Image
+
+# The 64-bit hash is split into four 16-bit bands, each backed by an expression
+# index on images (see Image.__table_args__). Two hashes within distance r
+# agree on some band in at least 16 - r // 4 bits, so probing every band value
+# within r // 4 flipped bits finds all candidates (multi-index hashing).
+PHASH_BANDS = 4
+PHASH_BAND_BITS = 16
+PHASH_BAND_MASK = (1 << PHASH_BAND_BITS) - 1
+MAX_NEAR_DUPLICATE_RADIUS = 11
+
+
+def dhash(img: PILImage.Image) -> int:
+    """64-bit difference hash of an image, as a signed integer so it fits a BIGINT column."""
+    small = img.convert("L").resize((9, 8), PILImage.Resampling.BOX)
+    pixels = list(small.getdata())
+    value = 0
+    for row in range(8):
+        for col in range(8):
+            left = pixels[row * 9 + col]
+            right = pixels[row * 9 + col + 1]
+            value = (value << 1) | (left < right)
+    return value - (1 << 64) if value >= 1 << 63 else value
+
+
+def hamming(a: int, b: int) -> int:
+    return ((a ^ b) & 0xFFFFFFFFFFFFFFFF).bit_count()
+
+
+def _band(value: int, band: int) -> int:
+    return (value >> (band * PHASH_BAND_BITS)) & PHASH_BAND_MASK
+
+
+def band_expression(band: int):
+    """SQL expression matching the functional index for one hash band."""
+    return literal_column(f"((images.phash >> {band * PHASH_BAND_BITS}) & {PHASH_BAND_MASK})")
+
+
+def _band_probes(value: int, max_flips: int) -> list[int]:
+    probes = [value]
+    for flips in range(1, max_flips + 1):
+        for bits in combinations(range(PHASH_BAND_BITS), flips):
+            probe = value
+            for bit in bits:
+                probe ^= 1 << bit
+            probes.append(probe)
+    return probes
+
+
+async def find_near_duplicates(
+    db: AsyncSession, project_id: uuid.UUID, image: Image, radius: int,
+) -> list[tuple[Image, int]]:
+    """Images of the project whose hash is within ``radius`` bits of ``image``, closest first."""
+    if image.phash is None:
+        return []
+
+    max_flips = radius // PHASH_BANDS
+    conditions = [
+        band_expression(band).in_(_band_probes(_band(image.phash, band), max_flips))
+        for band in range(PHASH_BANDS)
+    ]
+    result = await db.execute(
+        select(Image).where(Image.project_id == project_id, Image.id != image.id, or_(*conditions))
+    )
+    matches = []
+    for candidate in result.scalars().all():
+        distance = hamming(candidate.phash, image.phash)
+        if distance <= radius:
+            matches.append((candidate, distance))
+    matches.sort(key=lambda match: match[1])
+    return matches
+
+
+async def assign_phash_cluster(db: AsyncSession, image: Image):
+    """Place a newly stored image in the near-duplicate cluster of its neighbours.
+
+    Clusters are single-linkage at ``settings.NEAR_DUPLICATE_RADIUS`` and named
+    by the smallest image id that started them. An image with no neighbour
+    starts its own cluster; one that bridges several clusters merges them.
+    """
+    if image.phash is None:
+        return
+
+    matches = await find_near_duplicates(db, image.project_id, image, settings.NEAR_DUPLICATE_RADIUS)
+    clusters = {match.phash_cluster or match.id for match, _ in matches}
+    if not clusters:
+        image.phash_cluster = image.id
+        await db.flush()
+        return
+
+    target = min(clusters)
+    image.phash_cluster = target
+    others = clusters - {target}
+    if others or any(match.phash_cluster is None for match, _ in matches):
+        # Matches without a cluster stood in for one by their own id, so they are moved too
+        await db.execute(
+            update(Image)
+            .where(
+                Image.project_id == image.project_id,
+                or_(Image.phash_cluster.in_(others), Image.id.in_(clusters)),
+            )
+            .values(phash_cluster=target)
+            .execution_options(synchronize_session=False)
+        )
+    await db.flush()
+
+
+async def list_phash_clusters(db: AsyncSession, project_id: uuid.UUID, min_size: int = 2) -> list[tuple[uuid.UUID, list[uuid.UUID]]]:
+    """Near-duplicate clusters of the project with at least ``min_size`` images."""
+    result = await db.execute(
+        select(Image.phash_cluster, func.array_agg(Image.id))
+        .where(Image.project_id == project_id, Image.phash_cluster.is_not(None))
+        .group_by(Image.phash_cluster)
+        .having(func.count() >= min_size)
+    )
+    return [(cluster_id, image_ids) for cluster_id, image_ids in result.all()]
@@ -0,0 +1,308 @@
+"""Where image files live: a local directory or an S3-compatible object store.
+
+Files are addressed by keys such as ``<project_id>/<file>.jpg``. Rows written
+before the storage layer existed hold full local paths under UPLOAD_DIR; the
+local backend still resolves those as-is.
+"""
+import asyncio
+import os
+import shutil
+from abc import ABC, abstractmethod
+from collections.abc import AsyncIterator
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from pathlib import Path
+
+from app.config import settings
+
+READ_CHUNK_SIZE = 1024 * 1024
+
+
+@dataclass
+class StoredObject:
+    key: str
+    size: int
+    modified_at: datetime
+
+
+class StorageBackend(ABC):
+    """Interface shared by the storage backends. All paths given to put_file are consumed."""
+
+    @abstractmethod
+    async def put_file(self, key: str, source: Path, content_type: str | None = None):
+        ...
+
+    @abstractmethod
+    async def read_bytes(self, key: str) -> bytes:
+        ...
+
+    @abstractmethod
+    async def read_range(self, key: str, start: int, end: int) -> bytes:
+        """Bytes ``start`` through ``end`` inclusive, as in an HTTP Range header."""
+
+    @abstractmethod
+    def iter_chunks(self, key: str, start: int = 0, end: int | None = None) -> AsyncIterator[bytes]:
+        ...
+
+    @abstractmethod
+    async def size(self, key: str) -> int | None:
+        """Object size in bytes, or None if it does not exist."""
+
+    async def exists(self, key: str) -> bool:
+        return await self.size(key) is not None
+
+    @abstractmethod
+    async def delete(self, key: str):
+        ...
+
+    async def delete_many(self, keys: list[str]):
+        for key in keys:
+            await self.delete(key)
+
+    def key_aliases(self, key: str) -> list[str]:
+        """Every form in which a listed key may be recorded in the database."""
+        return [key]
+
+    @abstractmethod
+    async def move(self, src: str, dst: str):
+        ...
+
+    @abstractmethod
+    async def copy(self, src: str, dst: str):
+        ...
+
+    @abstractmethod
+    async def download_to(self, key: str, dest: Path):
+        ...
+
+    @abstractmethod
+    def list_objects(self, prefix: str = "") -> AsyncIterator[StoredObject]:
+        ...
+
+    def local_path(self, key: str) -> Path | None:
+        """Filesystem path of the object when it is stored locally, else None."""
+        return None
+
+    async def presigned_url(self, key: str, filename: str | None = None) -> str | None:
+        """Time-limited URL clients can fetch the object from directly, if supported."""
+        return None
+
+
+class LocalStorage(StorageBackend):
+    def __init__(self, root: str):
+        self.root = Path(root)
+        self._legacy_prefix = str(self.root) + os.sep
+
+    def local_path(self, key: str) -> Path:
+        if os.path.isabs(key) or key.startswith(self._legacy_prefix):
+            return Path(key)
+        return self.root / key
+
+    async def put_file(self, key: str, source: Path, content_type: str | None = None):
+        path = self.local_path(key)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        os.replace(source, path)
+
+    async def read_bytes(self, key: str) -> bytes:
+        return await asyncio.to_thread(self.local_path(key).read_bytes)
+
+    async def read_range(self, key: str, start: int, end: int) -> bytes:
+        def _read():
+            with open(self.local_path(key), "rb") as f:
+                f.seek(start)
+                return f.read(end - start + 1)
+        return await asyncio.to_thread(_read)
+
+    async def iter_chunks(self, key: str, start: int = 0, end: int | None = None) -> AsyncIterator[bytes]:
+        with open(self.local_path(key), "rb") as f:
+            f.seek(start)
+            remaining = None if end is None else end - start + 1
+            while remaining is None or remaining > 0:
+                size = READ_CHUNK_SIZE if remaining is None else min(READ_CHUNK_SIZE, remaining)
+                chunk = await asyncio.to_thread(f.read, size)
+                if not chunk:
+                    break
+                if remaining is not None:
+                    remaining -= len(chunk)
+                yield chunk
+
+    async def size(self, key: str) -> int | None:
+        try:
+            return self.local_path(key).stat().st_size
+        except FileNotFoundError:
+            return None
+
+    async def delete(self, key: str):
+        self.local_path(key).unlink(missing_ok=True)
+
+    def key_aliases(self, key: str) -> list[str]:
+        # Rows from before the storage layer hold the full path under UPLOAD_DIR
+        return [key, str(self.root / key)]
+
+    async def move(self, src: str, dst: str):
+        dst_path = self.local_path(dst)
+        dst_path.parent.mkdir(parents=True, exist_ok=True)
+        os.replace(self.local_path(src), dst_path)
+
+    async def copy(self, src: str, dst: str):
+        src_path, dst_path = self.local_path(src), self.local_path(dst)
+        dst_path.parent.mkdir(parents=True, exist_ok=True)
+        try:
+            # Same filesystem: a hard link is an instant, space-free copy
+            os.link(src_path, dst_path)
+        except FileExistsError:
+            pass
+        except OSError:
+            await asyncio.to_thread(shutil.copyfile, src_path, dst_path)
+
+    async def download_to(self, key: str, dest: Path):
+        await asyncio.to_thread(shutil.copyfile, self.local_path(key), dest)
+
+    async def list_objects(self, prefix: str = "") -> AsyncIterator[StoredObject]:
+        base = self.root / prefix if prefix else self.root
+        for dirpath, _dirnames, filenames in os.walk(base):
+            for name in filenames:
+                path = Path(dirpath) / name
+                try:
+                    stat = path.stat()
+                except FileNotFoundError:
+                    continue
+                yield StoredObject(
+                    key=str(path.relative_to(self.root)),
+                    size=stat.st_size,
+                    modified_at=datetime.fromtimestamp(stat.st_mtime, timezone.utc),
+                )
+            await asyncio.sleep(0)
+
+
+class S3Storage(StorageBackend):
+    """S3-compatible object store (AWS S3, MinIO, ...).
+
+    boto3 is synchronous, so calls run in worker threads. One client is shared
+    by all of them; botocore keeps a connection pool of
+    S3_MAX_POOL_CONNECTIONS, and uploads above S3_MULTIPART_THRESHOLD go up
+    as parallel multipart uploads.
+    """
+
+    def __init__(self):
+        import boto3
+        from boto3.s3.transfer import TransferConfig
+        from botocore.config import Config
+
+        self.bucket = settings.S3_BUCKET
+        self.client = boto3.client(
+            "s3",
+            endpoint_url=settings.S3_ENDPOINT_URL or None,
+            region_name=settings.S3_REGION or None,
+            aws_access_key_id=settings.S3_ACCESS_KEY_ID or None,
+            aws_secret_access_key=settings.S3_SECRET_ACCESS_KEY or None,
+            config=Config(
+                max_pool_connections=settings.S3_MAX_POOL_CONNECTIONS,
+                s3={"addressing_style": settings.S3_ADDRESSING_STYLE},
+                retries={"max_attempts": 5, "mode": "adaptive"},
+            ),
+        )
+        self.transfer_config = TransferConfig(
+            multipart_threshold=settings.S3_MULTIPART_THRESHOLD,
+            multipart_chunksize=settings.S3_MULTIPART_CHUNKSIZE,
+            max_concurrency=settings.S3_MULTIPART_CONCURRENCY,
+        )
+
+    async def put_file(self, key: str, source: Path, content_type: str | None = None):
+        extra = {"ContentType": content_type} if content_type else None
+        try:
+            await asyncio.to_thread(
+                self.client.upload_file, str(source), self.bucket, key,
+                ExtraArgs=extra, Config=self.transfer_config,
+            )
+        finally:
+            source.unlink(missing_ok=True)
+
+    async def read_bytes(self, key: str) -> bytes:
+        def _read():
+            return self.client.get_object(Bucket=self.bucket, Key=key)["Body"].read()
+        return await asyncio.to_thread(_read)
+
+    async def read_range(self, key: str, start: int, end: int) -> bytes:
+        def _read():
+            response = self.client.get_object(Bucket=self.bucket, Key=key, Range=f"bytes={start}-{end}")
+            return response["Body"].read()
+        return await asyncio.to_thread(_read)
+
+    async def iter_chunks(self, key: str, start: int = 0, end: int | None = None) -> AsyncIterator[bytes]:
+        byte_range = f"bytes={start}-{'' if end is None else end}"
+        response = await asyncio.to_thread(
+            self.client.get_object, Bucket=self.bucket, Key=key, Range=byte_range,
+        )
+        body = response["Body"]
+        try:
+            while chunk := await asyncio.to_thread(body.read, READ_CHUNK_SIZE):
+                yield chunk
+        finally:
+            body.close()
+
+    async def size(self, key: str) -> int | None:
+        from botocore.exceptions import ClientError
+
+        try:
+            response = await asyncio.to_thread(self.client.head_object, Bucket=self.bucket, Key=key)
+        except ClientError as exc:
+            if exc.response.get("Error", {}).get("Code") in ("404", "NoSuchKey", "NotFound"):
+                return None
+            raise
+        return response["ContentLength"]
+
+    async def delete(self, key: str):
+        await asyncio.to_thread(self.client.delete_object, Bucket=self.bucket, Key=key)
+
+    async def delete_many(self, keys: list[str]):
+        # DeleteObjects accepts at most 1000 keys per request
+        for start in range(0, len(keys), 1000):
+            await asyncio.to_thread(
+                self.client.delete_objects,
+                Bucket=self.bucket,
+                Delete={"Objects": [{"Key": key} for key in keys[start:start + 1000]], "Quiet": True},
+            )
+
+    async def move(self, src: str, dst: str):
+        await self.copy(src, dst)
+        await self.delete(src)
+
+    async def copy(self, src: str, dst: str):
+        await asyncio.to_thread(
+            self.client.copy, {"Bucket": self.bucket, "Key": src}, self.bucket, dst, Config=self.transfer_config,
+        )
+
+    async def download_to(self, key: str, dest: Path):
+        await asyncio.to_thread(
+            self.client.download_file, self.bucket, key, str(dest), Config=self.transfer_config,
+        )
+
+    async def list_objects(self, prefix: str = "") -> AsyncIterator[StoredObject]:
+        paginator = self.client.get_paginator("list_objects_v2")
+        pages = iter(paginator.paginate(Bucket=self.bucket, Prefix=prefix))
+        while page := await asyncio.to_thread(next, pages, None):
+            for item in page.get("Contents", []):
+                yield StoredObject(key=item["Key"], size=item["Size"], modified_at=item["LastModified"])
+
+    async def presigned_url(self, key: str, filename: str | None = None) -> str | None:
+        params = {"Bucket": self.bucket, "Key": key}
+        if filename:
+            params["ResponseContentDisposition"] = f'inline; filename="{filename}"'
+        # Signing is local computation, no network round trip
+        return self.client.generate_presigned_url(
+            "get_object", Params=params, ExpiresIn=settings.S3_PRESIGN_EXPIRES,
+        )
+
+
+_storage: StorageBackend | None = None
+
+
+def get_storage() -> StorageBackend:
+    global _storage
+    if _storage is None:
+        if settings.STORAGE_BACKEND == "s3":
+            _storage = S3Storage()
+        else:
+            _storage = LocalStorage(settings.UPLOAD_DIR)
+    return _storage
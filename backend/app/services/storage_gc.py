@@ -0,0 +1,144 @@
+"""Deferred removal of stored files.
+
+Requests never delete files themselves. They record the keys of files that
+became unreferenced in the ``file_deletions`` outbox as part of their own
+transaction, so a rollback also cancels the deletion. A background sweeper in
+every worker drains the outbox in batches (SKIP LOCKED lets sweepers run side
+by side), and a reconciliation scan finds files that no row references at all,
+such as leftovers from before the outbox existed.
+"""
+import asyncio
+import logging
+from datetime import datetime, timedelta, timezone
+
+from sqlalchemy import delete, insert, select, union_all
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.config import settings
+from app.database import async_session
+from app.models.file_deletion import FileDeletion
+from app.models.image import Image, ImageBlob
+from app.services.image_service import INCOMING_DIR
+from app.services.storage import get_storage
+
+logger = logging.getLogger(__name__)
+
+RECONCILE_BATCH = 5000
+
+
+async def enqueue_file_deletions(db: AsyncSession, keys: list[str]):
+    if keys:
+        await db.execute(insert(FileDeletion), [{"storage_key": key} for key in keys])
+
+
+async def enqueue_legacy_project_files(db: AsyncSession, project_id):
+    """Queue the files of a project's images that predate content hashing (they own their files)."""
+    legacy = (Image.project_id == project_id) & Image.content_hash.is_(None)
+    await db.execute(
+        insert(FileDeletion).from_select(
+            ["storage_key"],
+            union_all(
+                select(Image.storage_path).where(legacy),
+                select(Image.thumbnail_path).where(legacy, Image.thumbnail_path.is_not(None)),
+            ),
+        )
+    )
+
+
+async def reap_unreferenced_blobs(db: AsyncSession):
+    """Delete blobs whose reference count dropped to zero and queue their files."""
+    result = await db.execute(
+        delete(ImageBlob)
+        .where(ImageBlob.ref_count <= 0)
+        .returning(ImageBlob.storage_path, ImageBlob.thumbnail_path)
+    )
+    keys = []
+    for storage_path, thumbnail_path in result.all():
+        keys.append(storage_path)
+        if thumbnail_path:
+            keys.append(thumbnail_path)
+    await enqueue_file_deletions(db, keys)
+
+
+async def sweep_file_deletions(batch_size: int | None = None) -> int:
+    """Remove one batch of queued files. Returns how many were processed."""
+    batch_size = batch_size or settings.FILE_SWEEPER_BATCH
+    async with async_session() as db:
+        result = await db.execute(
+            select(FileDeletion.id, FileDeletion.storage_key)
+            .order_by(FileDeletion.id)
+            .limit(batch_size)
+            .with_for_update(skip_locked=True)
+        )
+        rows = result.all()
+        if not rows:
+            return 0
+
+        await get_storage().delete_many([key for _id, key in rows])
+        await db.execute(delete(FileDeletion).where(FileDeletion.id.in_([row_id for row_id, _key in rows])))
+        await db.commit()
+        return len(rows)
+
+
+async def run_file_sweeper():
+    """Drain the deletion outbox until cancelled, backing off while it is empty."""
+    while True:
+        try:
+            processed = await sweep_file_deletions()
+        except asyncio.CancelledError:
+            raise
+        except Exception:
+            logger.exception("file sweeper batch failed")
+            processed = 0
+        if processed < settings.FILE_SWEEPER_BATCH:
+            await asyncio.sleep(settings.FILE_SWEEPER_INTERVAL)
+
+
+async def _referenced(db: AsyncSession, candidates: list[str]) -> set[str]:
+    known = set()
+    for column in (Image.storage_path, Image.thumbnail_path, ImageBlob.storage_path,
+                   ImageBlob.thumbnail_path, FileDeletion.storage_key):
+        result = await db.execute(select(column).where(column.in_(candidates)))
+        known.update(result.scalars().all())
+    return known
+
+
+async def reconcile_storage(dry_run: bool = False) -> dict:
+    """Find stored files that no image, blob or pending deletion refers to, and queue them.
+
+    Files younger than STORAGE_ORPHAN_GRACE_SECONDS are left alone, since an
+    upload stores its file shortly before its row commits. Only the upload
+    scratch directory is skipped.
+    """
+    storage = get_storage()
+    cutoff = datetime.now(timezone.utc) - timedelta(seconds=settings.STORAGE_ORPHAN_GRACE_SECONDS)
+    stats = {"scanned": 0, "orphaned": 0, "orphaned_bytes": 0}
+
+    async def _flush(batch):
+        aliases = [alias for obj in batch for alias in storage.key_aliases(obj.key)]
+        async with async_session() as db:
+            known = await _referenced(db, aliases)
+            orphans = [
+                obj for obj in batch
+                if not any(alias in known for alias in storage.key_aliases(obj.key))
+            ]
+            stats["orphaned"] += len(orphans)
+            stats["orphaned_bytes"] += sum(obj.size for obj in orphans)
+            if orphans and not dry_run:
+                await enqueue_file_deletions(db, [obj.key for obj in orphans])
+                await db.commit()
+
+    batch = []
+    async for obj in storage.list_objects():
+        if obj.key.startswith(INCOMING_DIR + "/") or obj.modified_at > cutoff:
+            continue
+        stats["scanned"] += 1
+        batch.append(obj)
+        if len(batch) >= RECONCILE_BATCH:
+            await _flush(batch)
+            batch = []
+    if batch:
+        await _flush(batch)
+
+    logger.info("storage reconciliation: %s", stats)
+    return stats
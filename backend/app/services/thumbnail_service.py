@@ -0,0 +1,222 @@
+"""Thumbnails rendered on first request and kept in a local disk cache.
+
+A variant is an (image, size, format) triple. Variants are addressed by the
+image's content hash (its id for images uploaded before hashing), so they are
+shared between projects and never go stale. The cache lives outside UPLOAD_DIR
+and is trimmed back under THUMBNAIL_CACHE_MAX_BYTES by evicting the least
+recently served files; hits refresh a file's mtime, which serves as the LRU
+clock.
+"""
+import asyncio
+import logging
+import os
+import struct
+import time
+import uuid
+from collections.abc import AsyncIterator
+from pathlib import Path
+
+from PIL import Image as PILImage
+
+try:  # AVIF encoder for Pillow < 11.3
+    import pillow_avif  # noqa: F401
+except ImportError:
+    pass
+
+from app.config import settings
+from app.models.image import Image
+from app.monitoring.metrics import THUMBNAIL_CACHE, THUMBNAIL_RENDER
+from app.services.process_pool import run_in_process
+from app.services.storage import get_storage
+
+logger = logging.getLogger(__name__)
+
+MEDIA_TYPES = {"avif": "image/avif", "webp": "image/webp", "jpeg": "image/jpeg"}
+ENCODER_OPTIONS = {
+    "avif": {"quality": 60, "speed": 8},
+    "webp": {"quality": 80, "method": 4},
+    "jpeg": {"quality": 85, "optimize": True},
+}
+# Don't refresh the LRU clock of a file served more recently than this
+TOUCH_INTERVAL = 60.0
+# Keep evicting until the cache is this fraction of its budget
+EVICT_TARGET = 0.9
+
+_inflight: dict[Path, asyncio.Future] = {}
+_written_since_sweep = 0
+
+
+def _supported_formats() -> set[str]:
+    PILImage.init()
+    return {fmt for fmt in MEDIA_TYPES if fmt.upper() in PILImage.SAVE}
+
+
+SUPPORTED_FORMATS = _supported_formats()
+
+
+def pick_size(requested: int | None) -> int:
+    """Snap a requested size to the smallest configured size that covers it."""
+    sizes = sorted(settings.THUMBNAIL_SIZES)
+    if requested is None:
+        return settings.THUMBNAIL_DEFAULT_SIZE
+    return next((s for s in sizes if s >= requested), sizes[-1])
+
+
+def negotiate_format(accept: str | None) -> str:
+    """First configured format the client accepts and Pillow can encode; JPEG otherwise."""
+    accepted = set()
+    for part in (accept or "").split(","):
+        media_type, *params = [item.strip() for item in part.split(";")]
+        q = next((p[2:] for p in params if p.startswith("q=")), "1")
+        try:
+            if float(q) <= 0:
+                continue
+        except ValueError:
+            continue
+        accepted.add(media_type.lower())
+    for fmt in settings.THUMBNAIL_FORMATS:
+        if fmt in SUPPORTED_FORMATS and MEDIA_TYPES.get(fmt) in accepted:
+            return fmt
+    return "jpeg"
+
+
+def _cache_path(image: Image, size: int, fmt: str) -> Path:
+    source_id = image.content_hash or image.id.hex
+    return Path(settings.THUMBNAIL_CACHE_DIR) / source_id[:2] / f"{source_id}_{size}.{fmt}"
+
+
+def render_thumbnail(source: Path, dest: Path, size: int, fmt: str) -> int:
+    """Encode one thumbnail variant to dest and return its size in bytes. Runs in the process pool."""
+    with PILImage.open(source) as img:
+        # Lets the JPEG decoder scale down by up to 8x while decoding
+        img.draft("RGB", (size, size))
+        img.thumbnail((size, size))
+        if img.mode != "RGB" and not (img.mode == "RGBA" and fmt != "jpeg"):
+            img = img.convert("RGB")
+        tmp = dest.with_name(f".{dest.name}.{uuid.uuid4().hex}")
+        img.save(tmp, fmt.upper(), **ENCODER_OPTIONS[fmt])
+    os.replace(tmp, dest)
+    return dest.stat().st_size
+
+
+async def _render(storage_key: str, dest: Path, size: int, fmt: str):
+    global _written_since_sweep
+    dest.parent.mkdir(parents=True, exist_ok=True)
+    storage = get_storage()
+    source = storage.local_path(storage_key)
+    tmp_source = None
+    if source is None:
+        tmp_source = dest.with_name(f".source-{uuid.uuid4().hex}")
+        await storage.download_to(storage_key, tmp_source)
+        source = tmp_source
+    try:
+        with THUMBNAIL_RENDER.labels(fmt).time():
+            written = await run_in_process(render_thumbnail, source, dest, size, fmt)
+    finally:
+        if tmp_source is not None:
+            tmp_source.unlink(missing_ok=True)
+
+    _written_since_sweep += written
+    if _written_since_sweep > settings.THUMBNAIL_CACHE_MAX_BYTES * (1 - EVICT_TARGET):
+        _written_since_sweep = 0
+        asyncio.get_running_loop().run_in_executor(None, evict_thumbnail_cache)
+
+
+def _touch(path: Path) -> bool:
+    try:
+        if time.time() - path.stat().st_mtime > TOUCH_INTERVAL:
+            os.utime(path)
+        return True
+    except FileNotFoundError:
+        return False
+
+
+async def get_thumbnail(image: Image, size: int, fmt: str) -> Path:
+    """Path of a cached thumbnail variant, rendering it first if needed.
+
+    Concurrent requests for the same missing variant wait on a single render.
+    """
+    path = _cache_path(image, size, fmt)
+    if _touch(path):
+        THUMBNAIL_CACHE.labels("hit").inc()
+        return path
+    THUMBNAIL_CACHE.labels("miss").inc()
+
+    render = _inflight.get(path)
+    if render is None:
+        render = asyncio.ensure_future(_render(image.storage_path, path, size, fmt))
+        _inflight[path] = render
+        render.add_done_callback(lambda _f: _inflight.pop(path, None))
+    # Shielded so one client disconnecting doesn't cancel the render for the others
+    await asyncio.shield(render)
+    return path
+
+
+async def _bundle_entry(image: Image, size: int, fmt: str) -> bytes:
+    path = await get_thumbnail(image, size, fmt)
+    data = await asyncio.to_thread(path.read_bytes)
+    return image.id.bytes + struct.pack(">I", len(data)) + data
+
+
+async def iter_thumbnail_bundle(images: list[Image], size: int, fmt: str) -> AsyncIterator[bytes]:
+    """Stream thumbnails as a bundle of ``16-byte image id | uint32 BE length | data`` entries.
+
+    Entries come in completion order, so cached tiles go out while misses are
+    still rendering. Images whose thumbnail can't be produced are left out.
+    """
+    pending = [asyncio.ensure_future(_bundle_entry(image, size, fmt)) for image in images]
+    try:
+        for entry in asyncio.as_completed(pending):
+            try:
+                yield await entry
+            except (asyncio.CancelledError, GeneratorExit):
+                raise
+            except Exception:
+                logger.warning("thumbnail bundle: skipping an image", exc_info=True)
+    finally:
+        for task in pending:
+            task.cancel()
+
+
+def evict_thumbnail_cache() -> int:
+    """Delete least recently served variants until the cache fits its budget. Returns bytes freed."""
+    entries = []
+    total = 0
+    for dirpath, _dirnames, filenames in os.walk(settings.THUMBNAIL_CACHE_DIR):
+        for name in filenames:
+            path = os.path.join(dirpath, name)
+            try:
+                stat = os.stat(path)
+            except FileNotFoundError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, path))
+            total += stat.st_size
+
+    budget = settings.THUMBNAIL_CACHE_MAX_BYTES
+    if total <= budget:
+        return 0
+
+    freed = 0
+    entries.sort()
+    for _mtime, file_size, path in entries:
+        if total - freed <= budget * EVICT_TARGET:
+            break
+        try:
+            os.unlink(path)
+        except FileNotFoundError:
+            pass
+        freed += file_size
+    logger.info("thumbnail cache: evicted %d bytes", freed)
+    return freed
+
+
+async def run_thumbnail_cache_janitor():
+    """Periodically trim the cache, catching growth from other workers sharing the directory."""
+    while True:
+        try:
+            await asyncio.to_thread(evict_thumbnail_cache)
+        except asyncio.CancelledError:
+            raise
+        except Exception:
+            logger.exception("thumbnail cache eviction failed")
+        await asyncio.sleep(settings.THUMBNAIL_CACHE_SWEEP_INTERVAL)
@@ -0,0 +1,43 @@
+"""File responses that keep file bytes out of the event loop where the deployment allows it.
+
+Range handling (single, multiple, If-Range) comes from Starlette's FileResponse.
+On top of that:
+
+- with ACCEL_REDIRECT_PREFIX set, files under UPLOAD_DIR are handed to the fronting
+  nginx through ``X-Accel-Redirect`` and the app sends headers only. This is the
+  only path on which file bytes skip Python, and the one to use in production;
+- otherwise the file is read in 1 MiB chunks, 16x fewer thread hand-offs than the
+  64 KiB default.
+"""
+import os
+from pathlib import Path
+
+from starlette.responses import FileResponse
+from starlette.types import Receive, Scope, Send
+
+from app.config import settings
+
+
+def accel_redirect_location(path: str | os.PathLike) -> str | None:
+    """Internal nginx location serving ``path``, if offloading is configured and applies to it."""
+    if not settings.ACCEL_REDIRECT_PREFIX:
+        return None
+    try:
+        relative = Path(path).resolve().relative_to(Path(settings.UPLOAD_DIR).resolve())
+    except ValueError:
+        return None
+    return settings.ACCEL_REDIRECT_PREFIX.rstrip("/") + "/" + relative.as_posix()
+
+
+class OffloadedFileResponse(FileResponse):
+    chunk_size = 1024 * 1024
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        location = accel_redirect_location(self.path)
+        if location is None:
+            return await super().__call__(scope, receive, send)
+
+        # nginx answers Range and conditional requests itself
+        self.headers["x-accel-redirect"] = location
+        await send({"type": "http.response.start", "status": self.status_code, "headers": self.raw_headers})
+        await send({"type": "http.response.body", "body": b"", "more_body": False})
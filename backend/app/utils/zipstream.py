@@ -0,0 +1,46 @@
+import io
+import zipfile
+
+
+class _StreamBuffer(io.RawIOBase):
+    """Write-only, non-seekable sink that hands back whatever was written since the last drain."""
+
+    def __init__(self):
+        self._chunks: list[bytes] = []
+        self._position = 0
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, data) -> int:
+        self._chunks.append(bytes(data))
+        self._position += len(data)
+        return len(data)
+
+    def tell(self) -> int:
+        return self._position
+
+    def drain(self) -> bytes:
+        data = b"".join(self._chunks)
+        self._chunks.clear()
+        return data
+
+
+class ZipStream:
+    """Build a zip archive incrementally, returning the bytes produced by each entry.
+
+    Because the sink is not seekable, zipfile writes sizes and CRCs in data
+    descriptors after each entry, so nothing has to be held back or rewritten.
+    """
+
+    def __init__(self, compression: int = zipfile.ZIP_DEFLATED):
+        self._buffer = _StreamBuffer()
+        self._zip = zipfile.ZipFile(self._buffer, "w", compression)
+
+    def writestr(self, name: str, data: bytes | str, compress_type: int | None = None) -> bytes:
+        self._zip.writestr(name, data, compress_type=compress_type)
+        return self._buffer.drain()
+
+    def close(self) -> bytes:
+        self._zip.close()
+        return self._buffer.drain()
@@ -0,0 +1,74 @@
+"""Compare file lookup latency in the flat and sharded upload layouts.
+
+Creates N empty files in each layout under a scratch directory (on the same
+filesystem as UPLOAD_DIR for representative numbers), then times stat() and
+open() on a random sample. Drop the page cache between runs for cold numbers.
+
+    python -m benchmarks.bench_file_lookup --files 1000000 --root /var/tmp/layout-bench
+"""
+import argparse
+import os
+import random
+import statistics
+import tempfile
+import time
+import uuid
+from pathlib import Path
+
+from app.services.image_service import original_key
+
+
+def _populate(root: Path, names: list[str], sharded: bool) -> list[Path]:
+    paths = []
+    for name in names:
+        path = root / (original_key("project", name) if sharded else f"project/{name}")
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.touch()
+        paths.append(path)
+    return paths
+
+
+def _time_lookups(paths: list[Path], samples: int) -> dict:
+    sample = random.sample(paths, min(samples, len(paths)))
+    stat_times, open_times = [], []
+    for path in sample:
+        start = time.perf_counter()
+        os.stat(path)
+        stat_times.append(time.perf_counter() - start)
+
+        start = time.perf_counter()
+        with open(path, "rb"):
+            pass
+        open_times.append(time.perf_counter() - start)
+
+    def summary(times):
+        times = sorted(times)
+        return {
+            "mean_us": statistics.fmean(times) * 1e6,
+            "p99_us": times[int(len(times) * 0.99) - 1] * 1e6,
+        }
+
+    return {"stat": summary(stat_times), "open": summary(open_times)}
+
+
+def main(args):
+    root = Path(args.root) if args.root else Path(tempfile.mkdtemp(prefix="layout-bench-"))
+    names = [f"{uuid.uuid4()}.jpg" for _ in range(args.files)]
+    for layout, sharded in (("flat", False), ("sharded", True)):
+        start = time.perf_counter()
+        paths = _populate(root / layout, names, sharded)
+        created = time.perf_counter() - start
+        result = _time_lookups(paths, args.samples)
+        print(
+            f"{layout:<8} create {created:7.1f}s  "
+            f"stat mean {result['stat']['mean_us']:7.1f}us p99 {result['stat']['p99_us']:7.1f}us  "
+            f"open mean {result['open']['mean_us']:7.1f}us p99 {result['open']['p99_us']:7.1f}us"
+        )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--files", type=int, default=1000000)
+    parser.add_argument("--samples", type=int, default=10000)
+    parser.add_argument("--root", help="scratch directory (default: a new temp dir)")
+    main(parser.parse_args())
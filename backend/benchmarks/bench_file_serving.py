@@ -0,0 +1,83 @@
+"""Compare throughput and CPU per GB of the file-serving paths.
+
+Drives the ASGI responses directly with a sink in place of the server, so the
+numbers are the application-side cost of getting file bytes to the server:
+
+- starlette:  FileResponse, 64 KiB reads through a thread each
+- chunked:    OffloadedFileResponse without X-Accel-Redirect, 1 MiB reads
+
+With ACCEL_REDIRECT_PREFIX set the app sends headers only, so there is
+nothing to measure here; that cost is nginx's.
+
+    python -m benchmarks.bench_file_serving --size-mb 512 --runs 5 [--range]
+
+Run it twice and drop the first result (or pre-warm the file) to compare
+page-cache-hot numbers.
+"""
+import argparse
+import asyncio
+import os
+import tempfile
+import time
+
+from starlette.responses import FileResponse
+
+from app.utils.file_response import OffloadedFileResponse
+
+
+class _Sink:
+    def __init__(self):
+        self.bytes = 0
+
+    async def __call__(self, message):
+        if message["type"] == "http.response.body":
+            self.bytes += len(message.get("body", b""))
+
+
+async def _receive():
+    return {"type": "http.disconnect"}
+
+
+def _scope(byte_range: str | None) -> dict:
+    headers = [(b"range", byte_range.encode())] if byte_range else []
+    return {"type": "http", "method": "GET", "headers": headers}
+
+
+async def _serve(kind: str, path: str, byte_range: str | None) -> tuple[float, float, int]:
+    response_class = FileResponse if kind == "starlette" else OffloadedFileResponse
+    response = response_class(path, media_type="application/octet-stream")
+    sink = _Sink()
+    wall, cpu = time.perf_counter(), time.process_time()
+    await response(_scope(byte_range), _receive, sink)
+    return time.perf_counter() - wall, time.process_time() - cpu, sink.bytes
+
+
+async def main(args):
+    with tempfile.NamedTemporaryFile(dir=args.dir, delete=False) as f:
+        block = os.urandom(1024 * 1024)
+        for _ in range(args.size_mb):
+            f.write(block)
+        path = f.name
+    byte_range = f"bytes={args.size_mb * 1024 * 1024 // 4}-" if args.range else None
+
+    try:
+        print(f"{'path':<10} {'GB/s':>8} {'CPU s/GB':>10}")
+        for kind in ("starlette", "chunked"):
+            walls, cpus, sent = [], [], 0
+            for _ in range(args.runs):
+                wall, cpu, sent = await _serve(kind, path, byte_range)
+                walls.append(wall)
+                cpus.append(cpu)
+            gb = sent / 1e9
+            print(f"{kind:<10} {gb / min(walls):>8.2f} {min(cpus) / gb:>10.3f}")
+    finally:
+        os.unlink(path)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--size-mb", type=int, default=512)
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--range", action="store_true", help="request the last three quarters of the file")
+    parser.add_argument("--dir", default=None, help="directory for the test file (default: system temp)")
+    asyncio.run(main(parser.parse_args()))
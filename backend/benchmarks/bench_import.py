@@ -0,0 +1,87 @@
+"""Throughput of the NDJSON pre-annotation import.
+
+Seeds a project without annotations into BENCH_DATABASE_URL (the database the
+server under test uses), then streams one import covering every image and
+reports annotations written per second.
+
+    python -m benchmarks.bench_import --base-url http://localhost:8000 --images 50000 --annotations 4
+"""
+import argparse
+import asyncio
+import json
+import random
+import time
+
+import httpx
+from sqlalchemy import text
+
+from benchmarks.loadtest import Recorder, login
+from benchmarks.seed import bench_engine, seed_project
+
+
+def _polygon(rng: random.Random, vertices: int) -> list[dict]:
+    cx, cy = rng.uniform(0.2, 0.8), rng.uniform(0.2, 0.8)
+    return [
+        {"x": round(cx + 0.1 * rng.uniform(0.5, 1) * dx, 6), "y": round(cy + 0.1 * rng.uniform(0.5, 1) * dy, 6)}
+        for dx, dy in ((1, 0), (1, 1), (0, 1), (-1, 1), (-1, 0), (-1, -1), (0, -1), (1, -1))[:vertices]
+    ]
+
+
+def _ndjson(image_ids, class_ids, per_image: int, vertices: int, batch: int = 500):
+    rng = random.Random(0)
+    lines = []
+    for image_id in image_ids:
+        annotations = [
+            {"class_id": str(rng.choice(class_ids)), "vertices": _polygon(rng, vertices)} for _ in range(per_image)
+        ]
+        lines.append(json.dumps({"image_id": str(image_id), "annotations": annotations}))
+        if len(lines) == batch:
+            yield ("\n".join(lines) + "\n").encode()
+            lines = []
+    if lines:
+        yield ("\n".join(lines) + "\n").encode()
+
+
+async def _main(args):
+    engine = bench_engine()
+    seeded = await seed_project(engine, images=args.images, annotations_per_image=0, members=1)
+    async with engine.connect() as conn:
+        params = {"project_id": seeded["project_id"]}
+        image_ids = list((await conn.execute(
+            text("SELECT id FROM images WHERE project_id = :project_id"), params,
+        )).scalars())
+        class_ids = list((await conn.execute(
+            text("SELECT id FROM project_classes WHERE project_id = :project_id"), params,
+        )).scalars())
+    await engine.dispose()
+
+    # Encoded up front so the client's JSON encoding isn't what gets measured
+    body = list(_ndjson(image_ids, class_ids, args.annotations, args.vertices))
+
+    async def stream():
+        for part in body:
+            yield part
+
+    async with httpx.AsyncClient(base_url=args.base_url, timeout=None) as client:
+        token = await login(client, Recorder(), seeded["admin_email"], seeded["password"])
+        start = time.perf_counter()
+        response = await client.post(
+            f"/api/projects/{seeded['project_id']}/import/annotations",
+            content=stream(),
+            headers={"Authorization": f"Bearer {token}", "Content-Type": "application/x-ndjson"},
+        )
+        elapsed = time.perf_counter() - start
+
+    response.raise_for_status()
+    summary = response.json()
+    print(f"{summary['annotations']} annotations on {summary['images']} images in {elapsed:.2f}s "
+          f"({summary['annotations'] / elapsed:,.0f} annotations/s), {summary['failed']} failed lines")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--base-url", default="http://localhost:8000")
+    parser.add_argument("--images", type=int, default=50000)
+    parser.add_argument("--annotations", type=int, default=4, help="annotations per image")
+    parser.add_argument("--vertices", type=int, default=8, help="vertices per polygon, at most 8")
+    asyncio.run(_main(parser.parse_args()))
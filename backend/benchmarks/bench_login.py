@@ -0,0 +1,78 @@
+"""Login throughput, and the latency of unrelated requests during a login storm.
+
+Seeds users into BENCH_DATABASE_URL (the database the server under test uses),
+measures a quiet baseline for /api/health and /api/auth/me, then runs
+--concurrency clients logging in back to back while the same probes keep
+going. With hashing off the event loop the probe latencies should barely move;
+logins beyond the hashing queue are answered with 503 rather than piling up.
+
+    python -m benchmarks.bench_login --base-url http://localhost:8000 --concurrency 200 --duration 20
+"""
+import argparse
+import asyncio
+import time
+
+import httpx
+
+from benchmarks.loadtest import Recorder, login, print_report
+from benchmarks.seed import bench_engine, seed_project
+
+
+async def _probe(client, recorder, token, deadline, label):
+    while time.perf_counter() < deadline:
+        await recorder.request(client, f"GET /health ({label})", "GET", "/api/health")
+        await recorder.request(
+            client, f"GET /auth/me ({label})", "GET", "/api/auth/me", headers={"Authorization": f"Bearer {token}"},
+        )
+        await asyncio.sleep(0.01)
+
+
+async def _stormer(client, recorder, email, password, deadline):
+    while time.perf_counter() < deadline:
+        response = await recorder.request(
+            client, "POST /auth/login", "POST", "/api/auth/login", json={"email": email, "password": password},
+        )
+        if response is not None and response.status_code == 503:
+            await asyncio.sleep(float(response.headers.get("retry-after", 1)))
+
+
+async def _main(args):
+    engine = bench_engine()
+    seeded = await seed_project(engine, images=0, annotations_per_image=0, members=args.users)
+    await engine.dispose()
+    emails = seeded["member_emails"]
+
+    recorder = Recorder()
+    limits = httpx.Limits(max_connections=args.concurrency + 4)
+    async with httpx.AsyncClient(base_url=args.base_url, limits=limits, timeout=60) as client:
+        token = await login(client, recorder, seeded["admin_email"], seeded["password"])
+
+        recorder.start()
+        await _probe(client, recorder, token, time.perf_counter() + args.baseline, "quiet")
+
+        deadline = time.perf_counter() + args.duration
+        await asyncio.gather(
+            _probe(client, recorder, token, deadline, "storm"),
+            *(
+                _stormer(client, recorder, emails[i % len(emails)], seeded["password"], deadline)
+                for i in range(args.concurrency)
+            ),
+        )
+        recorder.stop()
+
+    summary = recorder.summary()
+    print_report(summary)
+    logins = recorder.latencies["POST /auth/login"]
+    rejected = recorder.errors["POST /auth/login"]
+    print(f"\n{len(logins) - rejected} logins in {args.duration:.0f}s "
+          f"({(len(logins) - rejected) / args.duration:.1f}/s), {rejected} rejected")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--base-url", default="http://localhost:8000")
+    parser.add_argument("--users", type=int, default=50)
+    parser.add_argument("--concurrency", type=int, default=100, help="clients logging in back to back")
+    parser.add_argument("--baseline", type=float, default=5.0, help="seconds of probing before the storm")
+    parser.add_argument("--duration", type=float, default=20.0)
+    asyncio.run(_main(parser.parse_args()))
@@ -0,0 +1,49 @@
+"""Time the dataset split engine on a large synthetic project.
+
+    python -m benchmarks.bench_split --images 1000000
+"""
+import argparse
+import asyncio
+import time
+
+from sqlalchemy import func, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.models.image import Image
+from app.services.export_service import auto_split_dataset
+from benchmarks.seed import bench_engine, seed_project
+
+
+async def _split_counts(session: AsyncSession, project_id) -> dict:
+    result = await session.execute(
+        select(Image.dataset_split, func.count())
+        .where(Image.project_id == project_id)
+        .group_by(Image.dataset_split)
+    )
+    return dict(result.all())
+
+
+async def _main(args):
+    engine = bench_engine()
+    seeded = await seed_project(engine, images=args.images, annotations_per_image=args.annotations)
+    project_id = seeded["project_id"]
+
+    for mode in ("hash", "stratified"):
+        for run in range(args.runs):
+            async with AsyncSession(engine) as session:
+                start = time.perf_counter()
+                await auto_split_dataset(session, project_id, 0.8, 0.1, seed=42, mode=mode)
+                await session.commit()
+                elapsed = time.perf_counter() - start
+                counts = await _split_counts(session, project_id)
+            print(f"{mode:<10} run {run + 1}: {elapsed:7.2f}s  {counts}")
+
+    await engine.dispose()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--images", type=int, default=1000000)
+    parser.add_argument("--annotations", type=int, default=2, help="annotations per image")
+    parser.add_argument("--runs", type=int, default=3)
+    asyncio.run(_main(parser.parse_args()))
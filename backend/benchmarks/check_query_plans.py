@@ -0,0 +1,118 @@
+"""Fail if a hot query's plan regresses to a sequential scan on a large table.
+
+Seeds several synthetic projects into BENCH_DATABASE_URL (so one project is a
+small slice of each table, as in production), runs the queries behind the
+image grid, project list, assignment and export endpoints under EXPLAIN, and
+exits non-zero if any plan contains a Seq Scan on a watched table.
+
+    python -m benchmarks.check_query_plans --projects 10 --images 20000
+"""
+import argparse
+import asyncio
+import json
+import sys
+
+from sqlalchemy import func, select
+from sqlalchemy.ext.asyncio import AsyncConnection
+
+from app.models.annotation import Annotation
+from app.models.image import Image, ImageAssignment
+from app.models.user import User
+from app.services.image_service import image_list_query, images_after
+from benchmarks.seed import bench_engine, seed_project
+
+# Small tables (users, projects, classes, members) may legitimately be scanned
+WATCHED_TABLES = {"images", "annotations", "image_assignments", "image_blobs"}
+
+
+def _hot_queries(project_id, member_id, image, image_ids, class_id) -> dict:
+    project_images = select(Image.id).where(Image.project_id == project_id)
+    return {
+        "image annotation count": select(func.count(Annotation.id)).where(Annotation.image_id == image.id),
+        "image assignee": (
+            select(User.username)
+            .join(ImageAssignment, ImageAssignment.user_id == User.id)
+            .where(ImageAssignment.image_id == image.id)
+        ),
+        "project image count": select(func.count(Image.id)).where(Image.project_id == project_id),
+        "project annotation count": (
+            select(func.count(Annotation.id))
+            .join(Image, Annotation.image_id == Image.id)
+            .where(Image.project_id == project_id)
+        ),
+        # Built by the same helpers the listing and bundle endpoints use
+        "image listing (admin)": image_list_query(project_id).limit(100),
+        "image listing (annotator)": image_list_query(project_id, member_id).limit(100),
+        "next images (admin)": images_after(image_list_query(project_id), image.uploaded_at, image.id).limit(5),
+        "next images (annotator)": (
+            images_after(image_list_query(project_id, member_id), image.uploaded_at, image.id).limit(5)
+        ),
+        "split images": select(Image.id).where(Image.project_id == project_id, Image.dataset_split == "val"),
+        "export annotation batch": (
+            select(Annotation.image_id, Annotation.class_id, Annotation.vertices)
+            .where(Annotation.image_id.in_(image_ids))
+        ),
+        "class annotation count": select(func.count(Annotation.id)).where(Annotation.class_id == class_id),
+        "member assignment cleanup": (
+            select(ImageAssignment.image_id)
+            .where(ImageAssignment.user_id == member_id, ImageAssignment.image_id.in_(project_images))
+        ),
+    }
+
+
+async def explain(conn: AsyncConnection, stmt) -> dict:
+    """EXPLAIN a statement with its bound parameters and return the root plan node."""
+    compiled = stmt.compile(dialect=conn.dialect, compile_kwargs={"render_postcompile": True})
+    params = compiled.construct_params()
+    positional = tuple(params[name] for name in compiled.positiontup)
+    result = await conn.exec_driver_sql(f"EXPLAIN (FORMAT JSON) {compiled}", positional)
+    plan = result.scalar()
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+    return plan[0]["Plan"]
+
+
+def seq_scans(node: dict) -> list[str]:
+    found = []
+    if node.get("Node Type") == "Seq Scan" and node.get("Relation Name") in WATCHED_TABLES:
+        found.append(node["Relation Name"])
+    for child in node.get("Plans", []):
+        found.extend(seq_scans(child))
+    return found
+
+
+async def _main(args) -> int:
+    engine = bench_engine()
+    seeded = None
+    for _ in range(args.projects):
+        seeded = await seed_project(engine, images=args.images, annotations_per_image=args.annotations)
+    project_id, member_id = seeded["project_id"], seeded["member_ids"][0]
+
+    failures = 0
+    async with engine.connect() as conn:
+        images = (await conn.execute(
+            select(Image.id, Image.uploaded_at).where(Image.project_id == project_id).limit(16)
+        )).all()
+        image_ids = [row.id for row in images]
+        class_id = (await conn.execute(
+            select(Annotation.class_id).where(Annotation.image_id == image_ids[0]).limit(1)
+        )).scalar_one()
+
+        for name, stmt in _hot_queries(project_id, member_id, images[0], image_ids, class_id).items():
+            plan = await explain(conn, stmt)
+            scans = seq_scans(plan)
+            status = "FAIL" if scans else "ok"
+            detail = f"seq scan on {', '.join(scans)}" if scans else plan["Node Type"]
+            print(f"{status:<5} {name:<28} {detail}")
+            failures += bool(scans)
+
+    await engine.dispose()
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--projects", type=int, default=10, help="projects to seed; the last one is queried")
+    parser.add_argument("--images", type=int, default=20000, help="images per project")
+    parser.add_argument("--annotations", type=int, default=3, help="annotations per image")
+    sys.exit(asyncio.run(_main(parser.parse_args())))
@@ -0,0 +1,307 @@
+"""Drive annotator and admin workloads against a running server and report latency per endpoint.
+
+Seeds a synthetic project into BENCH_DATABASE_URL, uploads a few real images
+through the API for the file and thumbnail paths, then runs concurrent
+simulated users for a fixed time. The server under test must use the same
+database (migrated with ``alembic upgrade head``) as its DATABASE_URL.
+
+Annotators page through their assigned images, open one, load its
+annotations, save them back, and fetch thumbnails and the full image.
+Admins list projects, members, assignment stats and images, and export the
+project now and then.
+
+    python -m benchmarks.loadtest --base-url http://localhost:8000 \\
+        --images 20000 --annotators 50 --admins 2 --duration 60 --json run.json
+
+Pass ``--baseline`` with an earlier ``--json`` file to fail (exit 1) when an
+endpoint's p95 got more than ``--tolerance`` slower.
+"""
+import argparse
+import asyncio
+import io
+import json
+import math
+import random
+import sys
+import time
+from collections import defaultdict
+
+import httpx
+from PIL import Image as PILImage, ImageDraw
+
+from benchmarks.seed import bench_engine, seed_project
+
+
+class Recorder:
+    """Latencies and failures per endpoint; only requests made after the warmup are kept."""
+
+    def __init__(self):
+        self.recording = False
+        self.started = 0.0
+        self.stopped = 0.0
+        self.latencies: dict[str, list[float]] = defaultdict(list)
+        self.errors: dict[str, int] = defaultdict(int)
+
+    def start(self):
+        self.recording = True
+        self.started = time.perf_counter()
+
+    def stop(self):
+        self.recording = False
+        self.stopped = time.perf_counter()
+
+    async def request(self, client: httpx.AsyncClient, name: str, method: str, url: str, **kwargs) -> httpx.Response | None:
+        start = time.perf_counter()
+        try:
+            response = await client.request(method, url, **kwargs)
+        except httpx.HTTPError:
+            response = None
+        elapsed = time.perf_counter() - start
+        if self.recording:
+            self.latencies[name].append(elapsed)
+            if response is None or response.status_code >= 400:
+                self.errors[name] += 1
+        return response
+
+    def summary(self) -> dict[str, dict]:
+        seconds = (self.stopped or time.perf_counter()) - self.started
+        result = {}
+        for name in sorted(self.latencies):
+            samples = sorted(self.latencies[name])
+            result[name] = {
+                "count": len(samples),
+                "errors": self.errors[name],
+                "rps": round(len(samples) / seconds, 2),
+                "p50_ms": round(_percentile(samples, 50) * 1000, 2),
+                "p95_ms": round(_percentile(samples, 95) * 1000, 2),
+                "p99_ms": round(_percentile(samples, 99) * 1000, 2),
+                "max_ms": round(samples[-1] * 1000, 2),
+            }
+        return result
+
+
+def _percentile(samples: list[float], pct: float) -> float:
+    """Nearest-rank percentile of sorted samples."""
+    rank = max(1, -(-len(samples) * pct // 100))
+    return samples[int(rank) - 1]
+
+
+def _sample_jpeg(seed: int, width: int = 1920, height: int = 1080) -> bytes:
+    rng = random.Random(seed)
+    img = PILImage.new("RGB", (width, height), tuple(rng.randrange(256) for _ in range(3)))
+    draw = ImageDraw.Draw(img)
+    for _ in range(40):
+        x, y = rng.randrange(width), rng.randrange(height)
+        draw.ellipse(
+            (x, y, x + rng.randrange(20, 400), y + rng.randrange(20, 400)),
+            fill=tuple(rng.randrange(256) for _ in range(3)),
+        )
+    buf = io.BytesIO()
+    img.save(buf, "JPEG", quality=85)
+    return buf.getvalue()
+
+
+def _polygon(vertices: int) -> list[dict]:
+    cx, cy, r = random.uniform(0.2, 0.8), random.uniform(0.2, 0.8), random.uniform(0.02, 0.15)
+    return [
+        {"x": cx + r * math.cos(2 * math.pi * k / vertices), "y": cy + r * math.sin(2 * math.pi * k / vertices)}
+        for k in range(vertices)
+    ]
+
+
+async def login(client: httpx.AsyncClient, recorder: Recorder, email: str, password: str) -> str:
+    response = await recorder.request(
+        client, "POST /auth/login", "POST", "/api/auth/login", json={"email": email, "password": password},
+    )
+    if response is None or response.status_code != 200:
+        raise RuntimeError(f"login failed for {email}: {response.status_code if response else 'no response'}")
+    return response.json()["access_token"]
+
+
+async def upload_sample_images(client: httpx.AsyncClient, token: str, project_id, count: int) -> list[str]:
+    files = [("files", (f"sample_{i}.jpg", _sample_jpeg(i), "image/jpeg")) for i in range(count)]
+    response = await client.post(
+        f"/api/projects/{project_id}/images", files=files,
+        headers={"Authorization": f"Bearer {token}"}, timeout=300,
+    )
+    response.raise_for_status()
+    return [image["id"] for image in response.json()]
+
+
+async def annotator(client, recorder, deadline, email, password, project_id, sample_ids, args):
+    token = await login(client, recorder, email, password)
+    auth = {"Authorization": f"Bearer {token}"}
+    base = f"/api/projects/{project_id}"
+
+    response = await recorder.request(client, "GET /projects/{id}/classes", "GET", f"{base}/classes", headers=auth)
+    class_ids = [c["id"] for c in response.json()] if response is not None and response.status_code == 200 else []
+
+    image_ids: list[str] = []
+    iteration = 0
+    while time.perf_counter() < deadline:
+        if iteration % 10 == 0 or not image_ids:
+            response = await recorder.request(
+                client, "GET /images", "GET", f"{base}/images",
+                params={"skip": random.randrange(0, 5) * args.page_size, "limit": args.page_size}, headers=auth,
+            )
+            if response is not None and response.status_code == 200:
+                image_ids = [image["id"] for image in response.json()] or image_ids
+        iteration += 1
+        if not image_ids:
+            await asyncio.sleep(1)
+            continue
+
+        image_id = random.choice(image_ids)
+        image_base = f"{base}/images/{image_id}"
+        await recorder.request(client, "GET /images/{id}", "GET", image_base, headers=auth)
+        await recorder.request(client, "GET /annotations", "GET", f"{image_base}/annotations", headers=auth)
+
+        if sample_ids:
+            sample_id = random.choice(sample_ids)
+            await recorder.request(
+                client, "GET /images/{id}/thumbnail", "GET", f"{base}/images/{sample_id}/thumbnail",
+                params={"token": token, "size": 300}, headers={"Accept": "image/avif,image/webp,*/*"},
+            )
+            if iteration % 5 == 0:
+                await recorder.request(
+                    client, "POST /images/thumbnails", "POST", f"{base}/images/thumbnails",
+                    json={"image_ids": sample_ids, "size": 128}, headers=auth,
+                )
+            await recorder.request(
+                client, "GET /images/{id}/file", "GET", f"{base}/images/{sample_id}/file", params={"token": token},
+            )
+
+        if class_ids:
+            payload = {
+                "annotations": [
+                    {"class_id": random.choice(class_ids), "vertices": _polygon(args.vertices)}
+                    for _ in range(args.annotations)
+                ]
+            }
+            await recorder.request(client, "PUT /annotations", "PUT", f"{image_base}/annotations", json=payload, headers=auth)
+
+        if args.think_time:
+            await asyncio.sleep(random.expovariate(1 / args.think_time))
+
+
+async def admin(client, recorder, deadline, email, password, project_id, args):
+    token = await login(client, recorder, email, password)
+    auth = {"Authorization": f"Bearer {token}"}
+    base = f"/api/projects/{project_id}"
+    next_export = time.perf_counter() + args.export_every if args.export_every else float("inf")
+
+    while time.perf_counter() < deadline:
+        await recorder.request(client, "GET /projects", "GET", "/api/projects", headers=auth)
+        await recorder.request(client, "GET /projects/{id}/members", "GET", f"{base}/members", headers=auth)
+        await recorder.request(client, "GET /images/stats", "GET", f"{base}/images/stats", headers=auth)
+        await recorder.request(
+            client, "GET /images", "GET", f"{base}/images",
+            params={"skip": random.randrange(0, 20) * args.page_size, "limit": args.page_size}, headers=auth,
+        )
+        if time.perf_counter() >= next_export:
+            await recorder.request(
+                client, "POST /export/download (coco)", "POST", f"{base}/export/download",
+                json={"format": "coco"}, headers=auth, timeout=600,
+            )
+            next_export = time.perf_counter() + args.export_every
+        if args.think_time:
+            await asyncio.sleep(random.expovariate(1 / args.think_time))
+
+
+def print_report(summary: dict[str, dict]):
+    header = f"{'endpoint':<34} {'count':>7} {'err':>5} {'rps':>8} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'max ms':>9}"
+    print(header)
+    print("-" * len(header))
+    for name, row in summary.items():
+        print(
+            f"{name:<34} {row['count']:>7} {row['errors']:>5} {row['rps']:>8.1f} "
+            f"{row['p50_ms']:>9.1f} {row['p95_ms']:>9.1f} {row['p99_ms']:>9.1f} {row['max_ms']:>9.1f}"
+        )
+
+
+def compare_to_baseline(summary: dict[str, dict], baseline: dict[str, dict], tolerance: float) -> list[str]:
+    regressions = []
+    for name, row in summary.items():
+        before = baseline.get(name)
+        if before is None or row["count"] < 20 or before["count"] < 20:
+            continue
+        if row["p95_ms"] > before["p95_ms"] * (1 + tolerance):
+            regressions.append(f"{name}: p95 {before['p95_ms']:.1f} -> {row['p95_ms']:.1f} ms")
+    return regressions
+
+
+async def _main(args) -> int:
+    engine = bench_engine()
+    seeded = await seed_project(
+        engine,
+        images=args.images,
+        annotations_per_image=args.annotations,
+        vertices=args.vertices,
+        classes=args.classes,
+        members=args.members,
+    )
+    await engine.dispose()
+    project_id = seeded["project_id"]
+    print(f"seeded project {project_id}")
+
+    recorder = Recorder()
+    limits = httpx.Limits(max_connections=args.annotators + args.admins, max_keepalive_connections=args.annotators + args.admins)
+    async with httpx.AsyncClient(base_url=args.base_url, limits=limits, timeout=60) as client:
+        admin_token = await login(client, recorder, seeded["admin_email"], seeded["password"])
+        sample_ids = await upload_sample_images(client, admin_token, project_id, args.sample_files) if args.sample_files else []
+
+        deadline = time.perf_counter() + args.warmup + args.duration
+        users = [
+            annotator(
+                client, recorder, deadline, seeded["member_emails"][i % len(seeded["member_emails"])],
+                seeded["password"], project_id, sample_ids, args,
+            )
+            for i in range(args.annotators)
+        ] + [
+            admin(client, recorder, deadline, seeded["admin_email"], seeded["password"], project_id, args)
+            for _ in range(args.admins)
+        ]
+
+        async def measure():
+            await asyncio.sleep(args.warmup)
+            recorder.start()
+            await asyncio.sleep(args.duration)
+            recorder.stop()
+
+        await asyncio.gather(measure(), *users)
+
+    summary = recorder.summary()
+    print_report(summary)
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump({"config": {k: v for k, v in vars(args).items() if k not in ("json", "baseline")}, "endpoints": summary}, f, indent=2)
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            regressions = compare_to_baseline(summary, json.load(f)["endpoints"], args.tolerance)
+        for line in regressions:
+            print(f"REGRESSION {line}")
+        return 1 if regressions else 0
+    return 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--base-url", default="http://localhost:8000")
+    parser.add_argument("--images", type=int, default=10000, help="synthetic images to seed")
+    parser.add_argument("--annotations", type=int, default=3, help="annotations per image (seeded and saved)")
+    parser.add_argument("--vertices", type=int, default=8, help="vertices per annotation")
+    parser.add_argument("--classes", type=int, default=10)
+    parser.add_argument("--members", type=int, default=10, help="annotator accounts; simulated annotators share them")
+    parser.add_argument("--sample-files", type=int, default=20, help="real JPEGs uploaded for file and thumbnail requests")
+    parser.add_argument("--annotators", type=int, default=20, help="concurrent simulated annotators")
+    parser.add_argument("--admins", type=int, default=1, help="concurrent simulated admins")
+    parser.add_argument("--page-size", type=int, default=50)
+    parser.add_argument("--think-time", type=float, default=0.0, help="mean seconds between a user's actions")
+    parser.add_argument("--export-every", type=float, default=30.0, help="seconds between exports per admin; 0 = never")
+    parser.add_argument("--warmup", type=float, default=5.0)
+    parser.add_argument("--duration", type=float, default=60.0)
+    parser.add_argument("--json", help="write the results here")
+    parser.add_argument("--baseline", help="results of an earlier run to compare p95 latencies against")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="allowed p95 slowdown before failing")
+    sys.exit(asyncio.run(_main(parser.parse_args())))
@@ -5,5 +5,21 @@ while ! python -c "import asyncio, asyncpg; asyncio.run(asyncpg.connect('postgre
 done
 echo "PostgreSQL is ready!"
 
+echo "Applying migrations..."
+alembic upgrade head || exit 1
+
+# One worker per core unless WEB_CONCURRENCY says otherwise; each has its own DB pool
+WORKERS="${WEB_CONCURRENCY:-$(nproc)}"
+if [ "$WORKERS" -gt 1 ]; then
+  # Share the cores between the workers' image-processing pools instead of each taking all of them
+  export PROCESS_POOL_WORKERS="${PROCESS_POOL_WORKERS:-$(( ($(nproc) + WORKERS - 1) / WORKERS ))}"
+  export PROMETHEUS_MULTIPROC_DIR="${PROMETHEUS_MULTIPROC_DIR:-/tmp/prometheus-multiproc}"
+fi
+
+if [ -n "$PROMETHEUS_MULTIPROC_DIR" ]; then
+  # Metric files left by previous workers would be summed into the new ones
+  rm -rf "$PROMETHEUS_MULTIPROC_DIR" && mkdir -p "$PROMETHEUS_MULTIPROC_DIR"
+fi
+
 echo "Starting server..."
-exec uvicorn app.main:app --host 0.0.0.0 --port 8000
+exec uvicorn app.main:app --host 0.0.0.0 --port 8000 --workers "$WORKERS"
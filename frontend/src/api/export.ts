@@ -4,8 +4,10 @@ export async function splitDataset(projectId: string, trainRatio = 0.8): Promise
   await client.post(`/api/projects/${projectId}/export/split`, { train_ratio: trainRatio });
 }
 
-export async function downloadExport(projectId: string): Promise<Blob> {
-  const res = await client.post(`/api/projects/${projectId}/export/download`, {}, {
+export type ExportFormat = 'yolo' | 'coco' | 'masks';
+
+export async function downloadExport(projectId: string, format: ExportFormat = 'yolo'): Promise<Blob> {
+  const res = await client.post(`/api/projects/${projectId}/export/download`, { format }, {
     responseType: 'blob',
   });
   return res.data;
@@ -1,5 +1,5 @@
 import client from './client';
-import { ImageData, AssignmentStatsItem } from '../types/api';
+import { ImageData, ImageBundle, AssignmentStatsItem } from '../types/api';
 
 export async function listImages(projectId: string, skip = 0, limit = 1000): Promise<ImageData[]> {
   const res = await client.get(`/api/projects/${projectId}/images`, { params: { skip, limit } });
@@ -21,6 +21,12 @@ export async function deleteImage(projectId: string, imageId: string): Promise<v
   await client.delete(`/api/projects/${projectId}/images/${imageId}`);
 }
 
+// The image plus the next `ahead` images in list order, with their annotations.
+export async function getImageBundle(projectId: string, imageId: string, ahead = 3): Promise<ImageBundle> {
+  const res = await client.get(`/api/projects/${projectId}/images/${imageId}/bundle`, { params: { ahead } });
+  return res.data;
+}
+
 export function getImageFileUrl(projectId: string, imageId: string): string {
   const baseUrl = import.meta.env.VITE_API_URL || 'http://localhost:8000';
   return `${baseUrl}/api/projects/${projectId}/images/${imageId}/file`;
@@ -31,6 +37,36 @@ export function getThumbnailUrl(projectId: string, imageId: string): string {
   return `${baseUrl}/api/projects/${projectId}/images/${imageId}/thumbnail`;
 }
 
+function uuidFromBytes(bytes: Uint8Array): string {
+  const hex = Array.from(bytes, (b) => b.toString(16).padStart(2, '0')).join('');
+  return `${hex.slice(0, 8)}-${hex.slice(8, 12)}-${hex.slice(12, 16)}-${hex.slice(16, 20)}-${hex.slice(20)}`;
+}
+
+// Fetches many thumbnails in one request. Returns object URLs keyed by image id;
+// the caller revokes them with URL.revokeObjectURL.
+export async function fetchThumbnailBundle(
+  projectId: string, imageIds: string[], size?: number,
+): Promise<Map<string, string>> {
+  const res = await client.post(
+    `/api/projects/${projectId}/images/thumbnails`,
+    { image_ids: imageIds, size },
+    { responseType: 'arraybuffer' },
+  );
+  const type = res.headers['x-thumbnail-type'] || 'image/jpeg';
+  const buffer: ArrayBuffer = res.data;
+  const view = new DataView(buffer);
+  const urls = new Map<string, string>();
+  let offset = 0;
+  while (offset + 20 <= buffer.byteLength) {
+    const id = uuidFromBytes(new Uint8Array(buffer, offset, 16));
+    const length = view.getUint32(offset + 16);
+    const start = offset + 20;
+    urls.set(id, URL.createObjectURL(new Blob([buffer.slice(start, start + length)], { type })));
+    offset = start + length;
+  }
+  return urls;
+}
+
 // Assignment
 export async function assignImages(projectId: string, userId: string, imageIds: string[]): Promise<{ assigned: number }> {
   const res = await client.post(`/api/projects/${projectId}/images/assign`, { user_id: userId, image_ids: imageIds });
@@ -1,6 +1,9 @@
+import { useEffect, useState } from 'react';
 import { IconTrash, IconTag, IconUser } from '@tabler/icons-react';
 import { ImageData } from '../../types/api';
-import { getThumbnailUrl } from '../../api/images';
+import { fetchThumbnailBundle, getThumbnailUrl } from '../../api/images';
+
+const THUMBNAIL_BATCH = 500;
 
 interface Props {
   projectId: string;
@@ -15,6 +18,46 @@ interface Props {
 
 export function ImageGrid({ projectId, images, onImageClick, onDelete, isAdmin, selectionMode, selectedImageIds }: Props) {
   const token = localStorage.getItem('access_token');
+  const [thumbnails, setThumbnails] = useState<Map<string, string>>(new Map());
+  // The bundle that last finished (or failed), so tiles it had no thumbnail for can fall back
+  const [settledKey, setSettledKey] = useState<string | null>(null);
+  // Refetch when the set of images changes, not on every new array from the store
+  const idsKey = images.map((img) => img.id).join(',');
+  const bundleKey = `${projectId}/${idsKey}`;
+
+  // Load the grid's thumbnails in batched requests instead of one request per tile
+  useEffect(() => {
+    let cancelled = false;
+    const created: string[] = [];
+    const ids = idsKey ? idsKey.split(',') : [];
+    const batches: string[][] = [];
+    for (let i = 0; i < ids.length; i += THUMBNAIL_BATCH) {
+      batches.push(ids.slice(i, i + THUMBNAIL_BATCH));
+    }
+    Promise.all(batches.map((batch) => fetchThumbnailBundle(projectId, batch)))
+      .then((results) => {
+        const merged = new Map<string, string>();
+        for (const urls of results) {
+          urls.forEach((url, id) => {
+            merged.set(id, url);
+            created.push(url);
+          });
+        }
+        if (cancelled) {
+          created.forEach((url) => URL.revokeObjectURL(url));
+        } else {
+          setThumbnails(merged);
+          setSettledKey(`${projectId}/${idsKey}`);
+        }
+      })
+      .catch(() => {
+        if (!cancelled) setSettledKey(`${projectId}/${idsKey}`);
+      });
+    return () => {
+      cancelled = true;
+      created.forEach((url) => URL.revokeObjectURL(url));
+    };
+  }, [projectId, idsKey]);
 
   return (
     <div style={{
@@ -85,7 +128,10 @@ export function ImageGrid({ projectId, images, onImageClick, onDelete, isAdmin,
               position: 'relative',
             }}>
               <img
-                src={`${getThumbnailUrl(projectId, img.id)}?token=${token}`}
+                src={
+                  thumbnails.get(img.id)
+                  ?? (settledKey === bundleKey ? `${getThumbnailUrl(projectId, img.id)}?token=${token}` : undefined)
+                }
                 alt={img.filename}
                 style={{
                   width: '100%',
@@ -38,6 +38,14 @@ export function AnnotatorPage() {
     loadAnnotations(projectId, imageId).finally(() => setLoading(false));
   }, [projectId, imageId, loadAnnotations]);
 
+  // Warm the browser cache with the next few image files
+  useEffect(() => {
+    if (!projectId || currentIndex < 0) return;
+    for (const img of images.slice(currentIndex + 1, currentIndex + 4)) {
+      new window.Image().src = `${getImageFileUrl(projectId, img.id)}?token=${token}`;
+    }
+  }, [projectId, images, currentIndex, token]);
+
   useEffect(() => {
     const container = containerRef.current;
     if (!container) return;
@@ -1,7 +1,8 @@
 import { create } from 'zustand';
-import { Vertex } from '../types/api';
+import { Annotation, ImageBundle, Vertex } from '../types/api';
 import { LocalAnnotation, ToolMode, DrawingState } from '../types/annotation';
 import * as annotationApi from '../api/annotations';
+import * as imageApi from '../api/images';
 import { pixelToNormalized } from '../utils/coordinates';
 
 interface AnnotationState {
@@ -65,6 +66,24 @@ interface AnnotationState {
   reset: () => void;
 }
 
+const PREFETCH_AHEAD = 3;
+
+// Server annotations of the images after the current one, fetched ahead so that
+// moving to the next image doesn't wait on the network. Entries are used once.
+const prefetched = new Map<string, Annotation[]>();
+
+// Bumped on every navigation and around every save. A bundle requested before the
+// latest bump may predate a save, so its annotations are dropped instead of primed.
+let generation = 0;
+
+function toLocal(annotations: Annotation[]): LocalAnnotation[] {
+  return annotations.map((a) => ({
+    id: a.id,
+    classId: a.class_id,
+    vertices: a.vertices,
+  }));
+}
+
 function generateId(): string {
   return crypto.randomUUID();
 }
@@ -250,12 +269,27 @@ export const useAnnotationStore = create<AnnotationState>((set, get) => ({
       await state.saveAnnotations();
     }
 
-    const serverAnnotations = await annotationApi.listAnnotations(projectId, imageId);
-    const localAnnotations: LocalAnnotation[] = serverAnnotations.map((a) => ({
-      id: a.id,
-      classId: a.class_id,
-      vertices: a.vertices,
-    }));
+    const requested = ++generation;
+    const prime = (bundle: ImageBundle) => {
+      if (requested !== generation) return;
+      for (const item of bundle.images.slice(1)) {
+        if (item.image.id !== get().currentImageId) {
+          prefetched.set(item.image.id, item.annotations);
+        }
+      }
+    };
+
+    let serverAnnotations = prefetched.get(imageId);
+    prefetched.delete(imageId);
+    if (serverAnnotations) {
+      // Keep the window ahead filled without holding up this image
+      imageApi.getImageBundle(projectId, imageId, PREFETCH_AHEAD).then(prime).catch(() => {});
+    } else {
+      const bundle = await imageApi.getImageBundle(projectId, imageId, PREFETCH_AHEAD);
+      serverAnnotations = bundle.images[0].annotations;
+      prime(bundle);
+    }
+    const localAnnotations = toLocal(serverAnnotations);
 
     set({
       currentProjectId: projectId,
@@ -275,6 +309,8 @@ export const useAnnotationStore = create<AnnotationState>((set, get) => ({
     const { currentProjectId, currentImageId, annotations, isDirty } = get();
     if (!currentProjectId || !currentImageId || !isDirty) return;
 
+    generation++;
+    prefetched.delete(currentImageId);
     await annotationApi.bulkSaveAnnotations(
       currentProjectId,
       currentImageId,
@@ -284,10 +320,14 @@ export const useAnnotationStore = create<AnnotationState>((set, get) => ({
       }))
     );
 
+    generation++;
+    prefetched.delete(currentImageId);
     set({ isDirty: false });
   },
 
   reset: () => {
+    generation++;
+    prefetched.clear();
     set({
       currentImageId: null,
       currentProjectId: null,
@@ -67,6 +67,15 @@ export interface Annotation {
   created_at: string;
 }
 
+export interface ImageBundleItem {
+  image: ImageData;
+  annotations: Annotation[];
+}
+
+export interface ImageBundle {
+  images: ImageBundleItem[];
+}
+
 export interface AssignmentStatsItem {
   user_id: string;
   username: string;